@@ -0,0 +1,125 @@
+"""
+Cache applicatif pour les réponses coûteuses.
+
+Première étape process-local (cachetools.TTLCache) : l'interface
+get / set / delete / get_or_set est volontairement minimale pour pouvoir
+basculer vers Redis (REDIS_URL) sans toucher aux appelants.
+"""
+import threading
+
+from cachetools import TTLCache
+from sqlalchemy import event, inspect
+
+from app.models import ArcadeMachines, Friends, Games, PromoCodes, Users
+
+# TTL de sécurité : même sans invalidation, une entrée ne survit pas 5 minutes.
+_cache = TTLCache(maxsize=1024, ttl=300)
+_lock = threading.Lock()
+
+
+def get(key):
+    """Retourne la valeur cachée pour cette clé, ou None si absente/expirée."""
+    with _lock:
+        return _cache.get(key)
+
+
+def set(key, value):
+    """Stocke une valeur dans le cache."""
+    with _lock:
+        _cache[key] = value
+
+
+def delete(key):
+    """Invalide une entrée du cache (sans erreur si elle n'existe pas)."""
+    with _lock:
+        _cache.pop(key, None)
+
+
+def get_or_set(key, producer):
+    """Retourne la valeur cachée, ou la calcule via producer() et la stocke."""
+    value = get(key)
+    if value is None:
+        value = producer()
+        set(key, value)
+    return value
+
+
+def arcade_games_key(machine_id):
+    """Clé de cache pour la réponse 'jeux d'une borne'."""
+    return f"arcade:{machine_id}:games"
+
+
+def user_by_firebase_key(firebase_id):
+    """Clé de cache pour le lookup utilisateur par identifiant Firebase."""
+    return f"user:firebase:{firebase_id}"
+
+
+def user_by_id_key(user_id):
+    """Clé de cache pour le lookup utilisateur par identifiant."""
+    return f"user:id:{user_id}"
+
+
+def friends_overview_key(user_id):
+    """Clé de cache pour l'écran "amis" complet d'un utilisateur."""
+    return f"friends:{user_id}:overview"
+
+
+def games_list_key():
+    """Clé de cache pour la liste complète des jeux (hors supprimés)."""
+    return "games:all"
+
+
+def promo_codes_list_key():
+    """Clé de cache pour la liste des codes promo actifs (hors supprimés)."""
+    return "promo:all"
+
+
+def promo_code_by_code_key(code):
+    """Clé de cache pour le lookup d'un code promo par son code."""
+    return f"promo:code:{code}"
+
+
+# Invalidation pilotée par les événements SQLAlchemy : toute écriture sur une
+# borne (update, soft delete inclus, ou suppression physique) purge l'entrée.
+@event.listens_for(ArcadeMachines, "after_insert")
+@event.listens_for(ArcadeMachines, "after_update")
+@event.listens_for(ArcadeMachines, "after_delete")
+def _invalidate_arcade_games(mapper, connection, target):
+    delete(arcade_games_key(target.id))
+
+
+@event.listens_for(Users, "after_insert")
+@event.listens_for(Users, "after_update")
+@event.listens_for(Users, "after_delete")
+def _invalidate_user_by_firebase(mapper, connection, target):
+    delete(user_by_firebase_key(target.firebase_id))
+    delete(user_by_id_key(target.id))
+
+
+@event.listens_for(Games, "after_insert")
+@event.listens_for(Games, "after_update")
+@event.listens_for(Games, "after_delete")
+def _invalidate_games_list(mapper, connection, target):
+    delete(games_list_key())
+
+
+@event.listens_for(PromoCodes, "after_insert")
+@event.listens_for(PromoCodes, "after_update")
+@event.listens_for(PromoCodes, "after_delete")
+def _invalidate_promo_codes(mapper, connection, target):
+    delete(promo_codes_list_key())
+    delete(promo_code_by_code_key(target.code))
+    # Si le code vient d'être renommé, l'entrée de l'ancien code doit aussi
+    # tomber, sinon elle servirait le promo renommé jusqu'à expiration du TTL.
+    for old_code in inspect(target).attrs.code.history.deleted or ():
+        delete(promo_code_by_code_key(old_code))
+
+
+# Une amitié apparaît dans l'overview de ses deux extrémités : on purge les
+# deux entrées à chaque écriture.
+@event.listens_for(Friends, "after_insert")
+@event.listens_for(Friends, "after_update")
+@event.listens_for(Friends, "after_delete")
+def _invalidate_friends_overview(mapper, connection, target):
+    delete(friends_overview_key(target.friend_from_id))
+    delete(friends_overview_key(target.friend_to_id))
@@ -1,28 +1,111 @@
-from sqlalchemy import create_engine, event
-from sqlalchemy.orm import sessionmaker, declarative_base
-from datetime import datetime
+import functools
+from typing import Annotated
+
+from fastapi import Depends
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import NullPool
 import os
 
 Base = declarative_base()
 
+@functools.lru_cache(maxsize=1)
 def get_database_url():
+    """Lit (et mémoïse) l'URL de la BDD : tous les appelants voient la même valeur."""
     db_url = os.getenv("DATABASE_URL")
     if not db_url:
-        raise ValueError("DATABASE_URL is not set in the environment variables")  # ← Ligne 11 qui pose problème
+        raise ValueError("DATABASE_URL is not set in the environment variables")
     return db_url
 
-DATABASE_URL = get_database_url()
+def _pgbouncer_mode():
+    """Vrai quand l'app passe par PgBouncer en pool_mode=transaction."""
+    return os.getenv("PGBOUNCER_MODE", "").lower() in ("1", "true", "yes")
 
 def create_engine_and_session(db_url=None):
     """
     Initialise le moteur et la session SQLAlchemy.
     Permet d'injecter une URL spécifique pour les tests.
     """
-    engine = create_engine(db_url or get_database_url())
-    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db_url = db_url or get_database_url()
+    # Cache de requêtes compilées : 500 par défaut, ce qui peut churner quand
+    # toutes les routes CRUD sont chaudes. 1200 garde tout résident.
+    engine_kwargs = {"query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))}
+    if _pgbouncer_mode() and not db_url.startswith("sqlite"):
+        # PgBouncer (pool_mode=transaction) détient le vrai pool : garder un
+        # QueuePool côté app reviendrait à pooler deux fois et à retenir des
+        # connexions client que PgBouncer ne peut pas multiplexer.
+        engine_kwargs["poolclass"] = NullPool
+    elif not db_url.startswith("sqlite"):
+        # Pool dimensionné pour la charge concurrente de FastAPI : les valeurs
+        # par défaut (pool_size=5, max_overflow=10) saturent vite et font
+        # patienter les requêtes sur pool_timeout.
+        engine_kwargs.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            pool_pre_ping=True,  # Détecte les connexions mortes avec un simple SELECT 1
+        )
+    engine = create_engine(db_url, **engine_kwargs)
+    # expire_on_commit=False : après un commit, les objets gardent leur état
+    # au lieu d'être expirés puis rechargés par un SELECT dès qu'une route les
+    # sérialise. Les défauts serveur (uuid, timestamps) sont déjà ramenés par
+    # le RETURNING du flush, donc les valeurs restent justes.
+    return engine, sessionmaker(autocommit=False, autoflush=False,
+                                expire_on_commit=False, bind=engine)
+
+def _async_database_url(db_url):
+    """Traduit l'URL de la BDD vers son driver asyncio (asyncpg / aiosqlite)."""
+    if db_url.startswith("postgresql://"):
+        return db_url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if db_url.startswith("sqlite://"):
+        return db_url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return db_url
+
+def create_async_engine_and_session(db_url=None):
+    """
+    Initialise le moteur et la session asyncio (mêmes réglages de pool que le
+    moteur sync). Utilisé par les routes de lecture : les requêtes DB-bound
+    se multiplexent sur l'event loop au lieu d'occuper un thread chacune.
+    """
+    db_url = _async_database_url(db_url or get_database_url())
+    engine_kwargs = {"query_cache_size": int(os.getenv("DB_QUERY_CACHE_SIZE", "1200"))}
+    if _pgbouncer_mode() and not db_url.startswith("sqlite"):
+        # Sous PgBouncer en transaction pooling, les prepared statements ne
+        # survivent pas d'une transaction à l'autre : les caches d'asyncpg
+        # doivent être coupés, et le pool applicatif cède la place à celui de
+        # PgBouncer. prepared_statement_cache_size passe par l'URL (le dialecte
+        # le convertit lui-même) ; statement_cache_size est transmis typé via
+        # connect_args, car depuis l'URL asyncpg le recevrait en chaîne.
+        engine_kwargs["poolclass"] = NullPool
+        engine_kwargs["connect_args"] = {"statement_cache_size": 0}
+        sep = "&" if "?" in db_url else "?"
+        db_url += f"{sep}prepared_statement_cache_size=0"
+    elif not db_url.startswith("sqlite"):
+        engine_kwargs.update(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "20")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", "10")),
+            pool_pre_ping=True,
+        )
+    # Pas d'AUTOCOMMIT au niveau moteur : les lectures en streaming
+    # (db.stream / yield_per) passent par un curseur côté serveur qu'asyncpg
+    # refuse d'ouvrir hors transaction. La transaction implicite en lecture
+    # seule est quasi gratuite et le rollback à la fermeture de session rend
+    # la connexion propre au pool.
+    async_engine = create_async_engine(db_url, **engine_kwargs)
+    return async_engine, async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
 
 # Initialisation de la BDD
 engine, SessionLocal = create_engine_and_session()
+async_engine, AsyncSessionLocal = create_async_engine_and_session()
+
+async def get_async_db():
+    """Dépendance pour récupérer une session asyncio de la base de données."""
+    async with AsyncSessionLocal() as db:
+        yield db
 
 def get_db():
     """Dépendance pour récupérer une session de la base de données."""
@@ -32,17 +115,22 @@ def get_db():
     finally:
         db.close()
 
-# Configuration des événements SQLAlchemy pour les timestamps
-@event.listens_for(Base, 'before_insert', propagate=True)
-def set_created_at(mapper, connection, target):
-    """Configure la date de création lors de l'insertion d'un nouvel enregistrement."""
-    if hasattr(target, 'created_at') and target.created_at is None:
-        target.created_at = datetime.utcnow()
-    if hasattr(target, 'updated_at') and target.updated_at is None:
-        target.updated_at = datetime.utcnow()
-
-@event.listens_for(Base, 'before_update', propagate=True)
-def set_updated_at(mapper, connection, target):
-    """Met à jour le timestamp lors de la modification d'un enregistrement."""
-    if hasattr(target, 'updated_at'):
-        target.updated_at = datetime.utcnow()
+def get_db_committing():
+    """
+    Dépendance de session pour les routes d'écriture : commit explicite après
+    le handler. À utiliser avec Depends(get_db_committing, scope="function")
+    pour que le commit (et toute erreur) survienne avant l'envoi de la réponse.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+        db.commit()
+    finally:
+        db.close()
+
+# Alias Annotated partagés par toutes les routes : la dépendance n'est
+# introspectée et résolue qu'une fois, puis réutilisée d'un endpoint à
+# l'autre, au lieu d'un Depends(get_db) reconstruit par signature.
+DbSession = Annotated[Session, Depends(get_db)]
+AsyncDbSession = Annotated[AsyncSession, Depends(get_async_db)]
+CommittingDbSession = Annotated[Session, Depends(get_db_committing, scope="function")]
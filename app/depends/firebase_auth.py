@@ -1,17 +1,101 @@
+import hashlib
+import os
+import tempfile
+import threading
+import time
+
+import anyio.to_thread
+import requests
+from cachecontrol import CacheControl
+from cachecontrol.caches.file_cache import FileCache
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from firebase_admin import auth, credentials
+from cachetools import TTLCache
+from google.auth import transport
+from firebase_admin import auth, credentials, _token_gen
 import firebase_admin
-# Firebase Admin Setup
-cred = credentials.Certificate("./retronova-df56b-firebase-adminsdk-8qab9-2a10e2588c.json")
-firebase_admin.initialize_app(cred)
 
 security = HTTPBearer()
 
-def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+# Firebase Admin ne met en cache les certificats publics de Google qu'en
+# mémoire : chaque worker uvicorn refait l'aller-retour HTTPS à froid.
+# Un cache fichier partagé (qui respecte le max-age renvoyé par Google)
+# mutualise les certificats entre les workers et les redémarrages.
+_cert_cache_dir = os.path.join(tempfile.gettempdir(), "firebase_public_keys")
+_cert_session = CacheControl(requests.Session(), cache=FileCache(_cert_cache_dir))
+
+# Initialisation paresseuse du SDK : lire et parser la clé de service à
+# l'import sérialise les cold starts des workers et fait planter le process
+# avant même que FastAPI puisse logger quoi que ce soit.
+_firebase_app = None
+_firebase_app_lock = threading.Lock()
+
+_DEFAULT_CRED_PATH = "./retronova-df56b-firebase-adminsdk-8qab9-2a10e2588c.json"
+
+
+def _get_app():
+    """Initialise (une seule fois) et retourne l'application Firebase Admin."""
+    global _firebase_app
+    if _firebase_app is None:
+        with _firebase_app_lock:
+            if _firebase_app is None:
+                cred_path = os.getenv("FIREBASE_CRED_PATH", _DEFAULT_CRED_PATH)
+                cred = credentials.Certificate(cred_path)
+                app = firebase_admin.initialize_app(cred)
+                _install_shared_cert_cache(app)
+                _firebase_app = app
+    return _firebase_app
+
+
+def init_firebase():
+    """Hook de démarrage : initialise le SDK et pré-charge les certificats."""
+    _get_app()
+    prewarm_public_keys()
+
+
+def _install_shared_cert_cache(app):
+    """Branche le cache fichier sur le fetcher de certificats de Firebase Admin."""
+    client = auth._get_client(app)
+    fetch_request = client._token_verifier.request
+    fetch_request._session = _cert_session
+    fetch_request._delegate = transport.requests.Request(_cert_session)
+
+
+def prewarm_public_keys():
+    """Pré-charge les certificats publics pour que la première requête ne bloque pas."""
+    try:
+        _cert_session.get(_token_gen.ID_TOKEN_CERT_URI, timeout=10)
+    except requests.RequestException:
+        # Pas bloquant : le fetch se fera au premier verify_id_token.
+        pass
+
+
+# Cache process-local des tokens déjà vérifiés, pour éviter de refaire la
+# vérification RSA à chaque requête. Les clés sont des hashs SHA256 du token
+# (jamais le token brut). Le TTL couvre la durée de vie d'un ID token
+# Firebase (1 h) ; la fraîcheur réelle est garantie par le contrôle de
+# l'exp du token à chaque lecture, donc une entrée n'est jamais servie
+# au-delà de l'expiration décidée par Firebase.
+_token_cache = TTLCache(maxsize=10000, ttl=3600)
+_token_cache_lock = threading.Lock()
+
+async def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    cache_key = hashlib.sha256(token.encode()).digest()
+
+    with _token_cache_lock:
+        cached_token = _token_cache.get(cache_key)
+    if cached_token is not None and cached_token.get("exp", 0) > time.time():
+        return cached_token
+
     try:
-        decoded_token = auth.verify_id_token(token)
+        _get_app()
+        # La vérification RSA (et l'éventuel refresh HTTPS des certificats)
+        # est bloquante : on l'exécute dans le threadpool pour ne pas geler
+        # l'event loop pendant que d'autres requêtes attendent.
+        decoded_token = await anyio.to_thread.run_sync(auth.verify_id_token, token)
+        with _token_cache_lock:
+            _token_cache[cache_key] = decoded_token
         return decoded_token
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired token")
@@ -19,4 +103,4 @@ def verify_firebase_token(credentials: HTTPAuthorizationCredentials = Depends(se
 # @app.get("/protected")
 # def protected_route(user_data: dict = Depends(verify_firebase_token)):
 #     firebase_uuid = user_data.get("uid")  # Récupération de l'UID Firebase
-#     return {"message": "Access granted", "firebase_uuid": firebase_uuid}
\ No newline at end of file
+#     return {"message": "Access granted", "firebase_uuid": firebase_uuid}
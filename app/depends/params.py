@@ -0,0 +1,11 @@
+from typing import Annotated
+
+from fastapi import Query
+
+# Alias partagé par toutes les routes : le même objet Query est introspecté
+# une seule fois par FastAPI au lieu d'être reconstruit signature par
+# signature, et chaque endpoint garde simplement `include_deleted:
+# IncludeDeleted = False`.
+IncludeDeleted = Annotated[bool, Query(
+    description="Inclure les enregistrements supprimés logiquement"
+)]
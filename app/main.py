@@ -1,32 +1,58 @@
 
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from app.data_base import Base, engine
-from app.routes import user, friends, payments, games, arcadeMachines, parties, promoCode
+from app.depends.firebase_auth import init_firebase
+from app.routes import user, friends, payments, games, arcadeMachines, parties, promoCode, batch
 from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+
+logger = logging.getLogger(__name__)
+
+# Créer toutes les tables (à utiliser uniquement pendant le développement et
+# les tests : en production, passer par des migrations. Le flag évite 8+
+# allers-retours DDL par worker à chaque cold start.)
+if os.getenv("AUTO_CREATE_TABLES", "0") == "1":
+    Base.metadata.create_all(bind=engine)
 
-# Créer toutes les tables (à utiliser uniquement pendant le développement)
-Base.metadata.create_all(bind=engine)
 
-# Créer l'application FastAPI
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Initialise Firebase Admin au démarrage plutôt qu'à l'import."""
+    try:
+        init_firebase()
+    except Exception as exc:
+        # Sans clé de service (développement, tests), les routes publiques
+        # restent servies ; la vérification de token réessaiera l'init.
+        logger.warning("Firebase Admin non initialisé au démarrage : %s", exc)
+    yield
 
-# Définir les origines autorisées pour le CORS
-origins = [
-    "http://localhost",  # Permet les requêtes depuis localhost
-    "http://localhost:3000",  # Exemple pour une application frontend React qui tourne sur le port 3000
-    "https://ton-domaine.com",  # Ajoute d'autres domaines si nécessaire
-    "http://localhost:5173",
-]
+# Créer l'application FastAPI (orjson : sérialisation JSON en C, gère
+# nativement UUID et datetime)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
-# Ajouter le middleware CORS
+# Ajouter le middleware CORS : une regex compilée une fois remplace le scan
+# de la liste d'origines, et max_age fait cacher la réponse preflight par le
+# navigateur pendant 24 h (plus d'aller-retour OPTIONS).
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=origins,  # Autoriser ces origines
+    allow_origin_regex=r"^(http://localhost(:\d+)?|https://ton-domaine\.com)$",
     allow_credentials=True,
-    allow_methods=["*"],  # Permet toutes les méthodes HTTP (GET, POST, etc.)
-    allow_headers=["*"],  # Permet tous les en-têtes HTTP
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
+    allow_headers=["Authorization", "Content-Type"],
+    max_age=86400,
 )
 
+# Compression des réponses : les listes JSON (games, parties, payments,
+# promo_codes) sont surtout limitées par le réseau ; gzip les réduit de 5 à
+# 10× quand le client annonce Accept-Encoding. Le seuil évite de compresser
+# les petites réponses où le surcoût CPU ne se rentabilise pas.
+app.add_middleware(GZipMiddleware, minimum_size=1024)
+
 app.include_router(user.router, prefix="/users", tags=["Users"])
 
 app.include_router(friends.router, prefix="/friends", tags=["Friends"])
@@ -39,4 +65,6 @@ app.include_router(arcadeMachines.router, prefix="/arcade_machines", tags=["Arca
 
 app.include_router(parties.router, prefix="/parties", tags=["Parties"])
 
-app.include_router(promoCode.router, prefix="/promo_codes", tags=["Promo_Codes"])
\ No newline at end of file
+app.include_router(promoCode.router, prefix="/promo_codes", tags=["Promo_Codes"])
+
+app.include_router(batch.router, prefix="/batch", tags=["Batch"])
\ No newline at end of file
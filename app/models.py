@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, UniqueConstraint, DateTime, event
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Index, UniqueConstraint, DateTime, event, or_, text
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
+from sqlalchemy.sql import func
 import uuid
-from datetime import datetime
 from sqlalchemy.ext.declarative import declared_attr
 from app.data_base import Base
 
@@ -12,9 +12,11 @@ class BaseModel:
     Modèle de base pour toutes les tables de la base de données.
     Inclut des champs pour suivre la création, la mise à jour et la suppression logique.
     """
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
-    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
-    deleted_at = Column(DateTime, nullable=True)
+    # Timestamps remplis côté base (func.now()) : évite un appel Python par
+    # ligne et leur sérialisation dans les bind parameters.
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
     is_deleted = Column(Boolean, default=False, nullable=False)
 
     @declared_attr
@@ -28,15 +30,29 @@ class BaseModel:
 class Users(Base, BaseModel):
     __tablename__ = "users"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
-    publique_id = Column(String(12), unique=True, nullable=False)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
+    # Collation "C" côté Postgres : comparaison octet à octet (l'identifiant
+    # est purement ASCII), moitié moins chère qu'une collation locale-aware
+    # sur ce lookup fréquent ; neutre sur SQLite.
+    publique_id = Column(String(12).with_variant(String(12, collation="C"), "postgresql"),
+                         unique=True, nullable=False)
     firebase_id = Column(String(28), unique=True, nullable=False)
     first_name = Column(String(255), nullable=True)
     last_name = Column(String(255), nullable=True)
     nb_ticket = Column(Integer, default=0, nullable=False)
     bar = Column(Boolean, default=False, nullable=False)
 
-    __table_args__ = (UniqueConstraint('publique_id', 'firebase_id'),)
+    __table_args__ = (
+        UniqueConstraint('publique_id', 'firebase_id'),
+        # Index partiels sur les clés naturelles : les lookups par défaut
+        # (include_deleted=False) deviennent des parcours d'un B-tree compact
+        # qui ne référence que les lignes vivantes.
+        Index("idx_users_firebase_live", "firebase_id",
+              postgresql_where=text("is_deleted = false")),
+        Index("idx_users_publique_live", "publique_id",
+              postgresql_where=text("is_deleted = false")),
+    )
 
     # Relation vers un modèle Payments (exemple)
     payments = relationship("Payments", back_populates="user")
@@ -46,18 +62,26 @@ class Users(Base, BaseModel):
 class Games(Base, BaseModel):
     __tablename__ = "games"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     name = Column(String(255), unique=True, nullable=False)
     description = Column(String(255), nullable=True)
     nb_max_player = Column(Integer, nullable=False)
     nb_min_player = Column(Integer, nullable=False)
 
+    __table_args__ = (
+        # Même schéma que idx_arcade_live : le filtre is_deleted=false des
+        # listes devient un index scan sur un index partiel compact.
+        Index("idx_games_live", "id", postgresql_where=text("is_deleted = false")),
+    )
+
 
 # Table Arcade_machines
 class ArcadeMachines(Base, BaseModel):
     __tablename__ = "arcade_machines"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     name = Column(String(255), nullable=True)
     description = Column(String(255), nullable=True)
     localisation = Column(String(255), nullable=True)
@@ -67,12 +91,23 @@ class ArcadeMachines(Base, BaseModel):
     game1 = relationship("Games", foreign_keys=[game1_id])
     game2 = relationship("Games", foreign_keys=[game2_id])
 
+    __table_args__ = (
+        # Index partiel : les lookups filtrés sur is_deleted=false deviennent
+        # de purs index scans pour le chemin courant.
+        Index("idx_arcade_live", "id", postgresql_where=text("is_deleted = false")),
+        # Postgres n'indexe pas les FK automatiquement ; ces deux index servent
+        # les jointures de get_games_by_arcade_id.
+        Index("idx_arcade_game1_id", "game1_id"),
+        Index("idx_arcade_game2_id", "game2_id"),
+    )
+
 
 # Table Friends
 class Friends(Base, BaseModel):
     __tablename__ = "friends"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     friend_from_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     friend_to_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     accept = Column(Boolean, default=False, nullable=False)
@@ -85,6 +120,21 @@ class Friends(Base, BaseModel):
 
     __table_args__ = (
         UniqueConstraint("friend_from_id", "friend_to_id", name="unique_friendship"),
+        # Les listes d'amis filtrent sur accept/decline + (from == uid OR
+        # to == uid) : deux index composites donnent au planner un BitmapOr de
+        # deux index scans au lieu d'un seq scan, et couvrent aussi le
+        # prédicat "en attente" (accept=false AND decline=false) sans toucher
+        # au heap.
+        Index("idx_friends_from_accept", "friend_from_id", "accept", "decline"),
+        Index("idx_friends_to_accept", "friend_to_id", "accept", "decline"),
+        # Index partiels pour les demandes en attente : le prédicat est fixe
+        # (accept=false AND decline=false AND non supprimé), donc un index
+        # minuscule qui ne référence que les lignes chaudes et reste bon
+        # marché à maintenir en écriture.
+        Index("idx_friends_to_pending", "friend_to_id",
+              postgresql_where=text("accept = false AND decline = false AND is_deleted = false")),
+        Index("idx_friends_from_pending", "friend_from_id",
+              postgresql_where=text("accept = false AND decline = false AND is_deleted = false")),
     )
 
 
@@ -92,7 +142,8 @@ class Friends(Base, BaseModel):
 class Payments(Base, BaseModel):
     __tablename__ = "payments"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     session_stripe_token = Column(String, unique=True, nullable=False)
     amount = Column(Integer, nullable=False)
@@ -101,12 +152,20 @@ class Payments(Base, BaseModel):
     # Relation
     user = relationship("Users", back_populates="payments")
 
+    __table_args__ = (
+        Index("idx_payments_live", "id", postgresql_where=text("is_deleted = false")),
+        # FK non indexée par défaut : sert les listes de paiements par
+        # utilisateur.
+        Index("idx_payments_user_id", "user_id"),
+    )
+
 
 # Table Parties
 class Parties(Base, BaseModel):
     __tablename__ = "parties"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     player1_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     player2_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     game_id = Column(UUID(as_uuid=True), ForeignKey("games.id"), nullable=False)
@@ -125,14 +184,51 @@ class Parties(Base, BaseModel):
     game = relationship("Games")
     machine = relationship("ArcadeMachines")
 
+    __table_args__ = (
+        Index("idx_parties_live", "id", postgresql_where=text("is_deleted = false")),
+    )
+
+
 class PromoCodes(Base, BaseModel):
     __tablename__ = "promo_codes"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, unique=True)
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4,
+                server_default=text("gen_random_uuid()"), unique=True)
     code = Column(String(12), unique=True, nullable=False)
     nb_parties = Column(Integer, default=1, nullable=False)
     is_active = Column(Boolean, default=True, nullable=False)
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     expires_at = Column(DateTime, nullable=True)
     used_count = Column(Integer, default=0, nullable=False)
-    max_uses = Column(Integer, nullable=True)
\ No newline at end of file
+    max_uses = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Le lookup par code filtre toujours is_deleted=false : cet index
+        # partiel couvre exactement ce prédicat (l'index unique global sur
+        # code reste garant de l'unicité, supprimés compris).
+        Index("idx_promo_codes_code_live", "code",
+              postgresql_where=text("is_deleted = false")),
+    )
+
+
+# Filtre de suppression logique appliqué globalement : chaque SELECT ORM
+# reçoit le critère is_deleted via with_loader_criteria au lieu d'un wrapper
+# Python par requête — impossible à oublier sur un nouvel endpoint, et la
+# clause couvre aussi les entités jointes/aliasées. Les chemins qui doivent
+# voir les lignes supprimées (restauration, détection de doublons) posent
+# l'option d'exécution include_deleted=True.
+@event.listens_for(Session, "do_orm_execute")
+def _add_soft_delete_criteria(execute_state):
+    if (
+        execute_state.is_select
+        and not execute_state.is_column_load
+        and not execute_state.is_relationship_load
+        and not execute_state.execution_options.get("include_deleted", False)
+    ):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(
+                BaseModel,
+                lambda cls: or_(cls.is_deleted.is_(False), cls.is_deleted.is_(None)),
+                include_aliases=True,
+            )
+        )
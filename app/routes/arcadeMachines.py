@@ -1,23 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.data_base import get_db
+import hashlib
+
+import orjson
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from app.data_base import DbSession, AsyncDbSession, CommittingDbSession
 from app.schemas import ArcadeMachineCreate, ArcadeMachineResponse, ArcadeMachineUpdate
 from app.services.arcadeMachines import (
+    bulk_create_arcade_machines_service,
     create_arcade_machine_service,
     get_all_arcade_machines_service,
+    stream_all_arcade_machines_service,
     get_arcade_machine_by_id_service,
     update_arcade_machine_service,
     delete_arcade_machine_service,
     restore_arcade_machine_service
 )
-from app.models import ArcadeMachines
-from app.utils.db_utils import filter_deleted
+from app.models import ArcadeMachines, Games
+from app import cache
+from app.utils.streaming import ndjson_stream
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
 from uuid import UUID
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateurs construits une fois à l'import : sérialisent les lignes en un
+# seul passage au lieu de laisser FastAPI re-valider chaque ligne contre le
+# response_model à chaque requête.
+_arcade_adapter = TypeAdapter(ArcadeMachineResponse)
+_arcade_list_adapter = TypeAdapter(list[ArcadeMachineResponse])
+
+
+def _etag_for(payload: bytes) -> str:
+    """ETag faible dérivé du contenu : les clients re-pollent le même id souvent."""
+    return f'"{hashlib.md5(payload).hexdigest()}"'
+
 @router.post("/", response_model=ArcadeMachineResponse, tags=["Arcade_Machines"], name="Create Arcade Machines")
-def create_arcade_machine(machine: ArcadeMachineCreate, db: Session = Depends(get_db)):
+def create_arcade_machine(machine: ArcadeMachineCreate, db: CommittingDbSession):
     """
     Endpoint to create a new arcade machine.
 
@@ -35,16 +56,34 @@ def create_arcade_machine(machine: ArcadeMachineCreate, db: Session = Depends(ge
     return create_arcade_machine_service(db, machine)
 
 
-@router.get("/", response_model=list[ArcadeMachineResponse], tags=["Arcade_Machines"], name="Get Arcade Machines")
-def get_all_arcade_machines(
-    include_deleted: bool = Query(False, description="Include soft-deleted machines"),
-    db: Session = Depends(get_db)
+@router.post("/bulk", tags=["Arcade_Machines"], name="Bulk Create Arcade Machines")
+def bulk_create_arcade_machines(machines: list[ArcadeMachineCreate], db: DbSession):
+    """
+    Endpoint d'import en lot : insère toutes les bornes du corps de requête en
+    une passe executemany et un seul commit, au lieu de N POST unitaires.
+
+    Args:
+        machines (list[ArcadeMachineCreate]): Les bornes à insérer.
+        db (Session): Database session dependency.
+
+    Returns:
+        dict: {"created": <nombre de bornes insérées>}.
+    """
+    return {"created": bulk_create_arcade_machines_service(db, machines)}
+
+
+@router.get("/", tags=["Arcade_Machines"], name="Get Arcade Machines")
+async def get_all_arcade_machines(
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False,
+    stream: bool = Query(False, description="Stream the response as NDJSON instead of a JSON array")
 ):
     """
     Endpoint to retrieve all arcade machines.
 
     Args:
         include_deleted (bool, optional): If True, include soft-deleted machines. Defaults to False.
+        stream (bool, optional): If True, stream the machines as NDJSON. Defaults to False.
         db (Session): Database session dependency.
 
     Returns:
@@ -53,14 +92,27 @@ def get_all_arcade_machines(
     Raises:
         HTTPException: If an error occurs while fetching the arcade machines (optional, if implemented).
     """
-    return get_all_arcade_machines_service(db, include_deleted)
+    if stream:
+        rows = await stream_all_arcade_machines_service(db, include_deleted)
+        return StreamingResponse(ndjson_stream(rows, _arcade_adapter),
+                                 media_type="application/x-ndjson")
+
+    machines = await get_all_arcade_machines_service(db, include_deleted)
+    return ORJSONResponse(
+        _arcade_list_adapter.dump_python(
+            _arcade_list_adapter.validate_python(machines, from_attributes=True),
+            mode="json",
+        )
+    )
 
 
 @router.get("/{machine_id}", response_model=ArcadeMachineResponse, tags=["Arcade_Machines"], name="Get Arcade Machines by id")
-def get_arcade_machine_by_id(
+async def get_arcade_machine_by_id(
     machine_id: UUID,
-    include_deleted: bool = Query(False, description="Include soft-deleted machines"),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve a specific arcade machine by its unique ID.
@@ -77,11 +129,19 @@ def get_arcade_machine_by_id(
         HTTPException:
             - 404 status code if the arcade machine is not found.
     """
-    return get_arcade_machine_by_id_service(db, machine_id, include_deleted)
+    machine = await get_arcade_machine_by_id_service(db, machine_id, include_deleted)
+
+    # ETag basé sur updated_at : si le client a déjà la version courante,
+    # un 304 évite sérialisation, encodage JSON et octets réseau.
+    etag = _etag_for(f"{machine.id}:{machine.updated_at}".encode())
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    response.headers["ETag"] = etag
+    return machine
 
 
 @router.put("/{machine_id}", response_model=ArcadeMachineResponse, tags=["Arcade_Machines"], name="Update Arcade Machines")
-def update_arcade_machine(machine_id: UUID, machine: ArcadeMachineUpdate, db: Session = Depends(get_db)):
+def update_arcade_machine(machine_id: UUID, machine: ArcadeMachineUpdate, db: CommittingDbSession):
     """
     Endpoint to update an existing arcade machine.
 
@@ -104,8 +164,8 @@ def update_arcade_machine(machine_id: UUID, machine: ArcadeMachineUpdate, db: Se
 @router.delete("/{machine_id}", tags=["Arcade_Machines"], name="Delete Arcade Machines")
 def delete_arcade_machine(
     machine_id: UUID,
-    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete"),
-    db: Session = Depends(get_db)
+    db: CommittingDbSession,
+    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete")
 ):
     """
     Endpoint to delete an existing arcade machine.
@@ -126,7 +186,7 @@ def delete_arcade_machine(
 
 
 @router.post("/{machine_id}/restore", response_model=ArcadeMachineResponse, tags=["Arcade_Machines"], name="Restore Deleted Arcade Machine")
-def restore_arcade_machine(machine_id: UUID, db: Session = Depends(get_db)):
+def restore_arcade_machine(machine_id: UUID, db: CommittingDbSession):
     """
     Endpoint to restore a soft-deleted arcade machine.
 
@@ -146,10 +206,11 @@ def restore_arcade_machine(machine_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.get("/{machine_id}/games", tags=["Arcade_Machines"], name="Get Games by Arcade Machine ID")
-def get_games_by_arcade_id(
+async def get_games_by_arcade_id(
     machine_id: UUID,
-    include_deleted: bool = Query(False, description="Include soft-deleted machines"),
-    db: Session = Depends(get_db)
+    request: Request,
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve the games associated with a specific arcade machine.
@@ -166,15 +227,45 @@ def get_games_by_arcade_id(
         HTTPException:
             - 404 status code if the arcade machine is not found.
     """
-    query = db.query(ArcadeMachines).filter(ArcadeMachines.id == machine_id)
-    query = filter_deleted(query, include_deleted)
-    arcade = query.first()
-
-    if not arcade:
+    # Réponse cachée tant que la borne n'est pas modifiée (invalidation par
+    # événement SQLAlchemy dans app/cache.py).
+    cache_key = cache.arcade_games_key(machine_id)
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return _games_response(cached, request)
+
+    # Une seule requête avec jointures : l'endpoint n'a besoin que de trois
+    # chaînes, inutile d'hydrater la machine puis de lazy-loader game1/game2.
+    game1 = aliased(Games)
+    game2 = aliased(Games)
+    stmt = (
+        select(ArcadeMachines.name, game1.name, game2.name)
+        .outerjoin(game1, ArcadeMachines.game1_id == game1.id)
+        .outerjoin(game2, ArcadeMachines.game2_id == game2.id)
+        .where(ArcadeMachines.id == machine_id)
+    )
+    if include_deleted:
+        stmt = stmt.execution_options(include_deleted=True)
+    row = (await db.execute(stmt)).first()
+
+    if not row:
         raise HTTPException(status_code=404, detail="Arcade machine not found")
 
-    return {
-        "name": arcade.name if arcade.name else None,
-        "game1": arcade.game1.name if arcade.game1 else None,
-        "game2": arcade.game2.name if arcade.game2 else None
-    }
\ No newline at end of file
+    result = {
+        "name": row[0] if row[0] else None,
+        "game1": row[1] if row[1] else None,
+        "game2": row[2] if row[2] else None
+    }
+    if not include_deleted:
+        cache.set(cache_key, result)
+    return _games_response(result, request)
+
+
+def _games_response(result: dict, request: Request):
+    """Réponse JSON avec ETag ; 304 sans corps si le client est déjà à jour."""
+    payload = orjson.dumps(result)
+    etag = _etag_for(payload)
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    return Response(content=payload, media_type="application/json", headers={"ETag": etag})
\ No newline at end of file
@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+from fastapi import APIRouter, HTTPException, Request
+
+from app.schemas import BatchRequest, BatchResponse
+
+router = APIRouter()
+
+
+def _targets_batch(url: str) -> bool:
+    """Vrai si l'URL d'une sous-requête reviendrait sur l'endpoint batch."""
+    path = url.split("?", 1)[0].rstrip("/")
+    return path == "/batch"
+
+
+@router.post("/", response_model=BatchResponse, tags=["Batch"], name="Execute Batch Requests")
+async def execute_batch(batch: BatchRequest, request: Request):
+    """
+    Endpoint pour exécuter plusieurs sous-requêtes API en un seul appel HTTP.
+
+    Les clients qui assemblent un écran paient sinon un aller-retour
+    HTTPS complet (TLS, routing, validation) par ressource ; ici un seul
+    appel transporte toutes les sous-requêtes et elles s'exécutent en
+    parallèle côté serveur via asyncio.gather, donc les lectures SQL
+    indépendantes se recouvrent.
+
+    Args:
+        batch (BatchRequest): La liste des sous-requêtes {id, method, url, body}
+            (20 au maximum, URLs relatives à l'API).
+        request (Request): La requête entrante, dont l'en-tête Authorization
+            est propagé aux sous-requêtes.
+
+    Returns:
+        BatchResponse: Une liste {id, status, body} dans l'ordre d'entrée.
+
+    Raises:
+        HTTPException: 400 si une sous-requête cible l'endpoint batch lui-même.
+    """
+    # Sans cette garde, un batch de batches multiplierait le fan-out
+    # in-process par 20 à chaque niveau d'imbrication.
+    if any(_targets_batch(sub.url) for sub in batch.requests):
+        raise HTTPException(status_code=400, detail="Batch requests cannot be nested")
+
+    headers = {}
+    authorization = request.headers.get("authorization")
+    if authorization:
+        headers["authorization"] = authorization
+
+    # Les sous-requêtes repassent par l'app ASGI en mémoire : pas de nouvelle
+    # connexion TCP/TLS, mais le routing, les dépendances et la validation
+    # s'appliquent normalement.
+    transport = httpx.ASGITransport(app=request.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://batch") as client:
+
+        async def dispatch(sub):
+            response = await client.request(
+                sub.method.upper(), sub.url, json=sub.body, headers=headers
+            )
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            return {"id": sub.id, "status": response.status_code, "body": body}
+
+        responses = await asyncio.gather(*(dispatch(sub) for sub in batch.requests))
+
+    return {"responses": list(responses)}
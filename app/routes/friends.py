@@ -1,22 +1,46 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter
 from fastapi import Query, Path
-from sqlalchemy.orm import Session
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
 from uuid import UUID
-from app.data_base import get_db
-from app.schemas import FriendsCreate, FriendsResponse, FriendsUpdate
+from app.data_base import DbSession, AsyncDbSession
+from app.schemas import FriendsCreate, FriendsOverviewResponse, FriendsResponse, FriendsUpdate
 from app.services.friends import (
     create_friend_service,
     get_friend_by_id_service,
     update_friend_service,
     delete_friend_service,
-    get_all_friends_service
+    get_all_friends_service,
+    stream_all_friends_service,
+    get_friends_overview_service,
+    get_friends_by_status_service,
+    get_pending_friends_service
 )
+from app import cache
+from app.utils.streaming import ndjson_stream
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateur construit une fois à l'import : les listes d'amitiés sont
+# sérialisées en un seul passage au lieu de laisser FastAPI re-valider
+# chaque ligne contre le response_model à chaque requête.
+_friends_list_adapter = TypeAdapter(list[FriendsResponse])
+_friend_adapter = TypeAdapter(FriendsResponse)
+
+
+def _friends_list_response(friendships):
+    """Sérialise une liste d'amitiés en ORJSONResponse sans re-validation FastAPI."""
+    return ORJSONResponse(
+        _friends_list_adapter.dump_python(
+            _friends_list_adapter.validate_python(friendships, from_attributes=True),
+            mode="json",
+        )
+    )
+
 
 @router.post("/", response_model=FriendsResponse, tags=["Friends"], name="Create Friend")
-def create_friend(friend_data: FriendsCreate, db: Session = Depends(get_db)):
+def create_friend(friend_data: FriendsCreate, db: DbSession):
     """
     Endpoint to create a new friendship.
 
@@ -35,7 +59,12 @@ def create_friend(friend_data: FriendsCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[FriendsResponse])  # Nouveau endpoint
-def get_all_friends(db: Session = Depends(get_db)):
+async def get_all_friends(
+        db: AsyncDbSession,
+        limit: int = Query(50, ge=1, le=200, description="Nombre maximum d'amitiés par page"),
+        offset: int = Query(0, ge=0, description="Nombre d'amitiés à sauter"),
+        stream: bool = Query(False, description="Streamer la réponse en NDJSON plutôt qu'en tableau JSON")
+):
     """
     Endpoint to retrieve all friendships.
 
@@ -48,11 +77,17 @@ def get_all_friends(db: Session = Depends(get_db)):
     Raises:
         HTTPException: If an error occurs while fetching the friendships (optional, if implemented).
     """
-    return get_all_friends_service(db)
+    if stream:
+        # Curseur serveur par lots de 500 : mémoire bornée quelle que soit la
+        # taille de la table, la pagination ne s'applique pas à ce mode.
+        rows = await stream_all_friends_service(db)
+        return StreamingResponse(ndjson_stream(rows, _friend_adapter),
+                                 media_type="application/x-ndjson")
+    return _friends_list_response(await get_all_friends_service(db, limit=limit, offset=offset))
 
 
 @router.get("/{friend_id}", response_model=FriendsResponse, tags=["Friends"], name="Get Friend by id")
-def get_friend_by_id(friend_id: UUID, db: Session = Depends(get_db)):
+async def get_friend_by_id(friend_id: UUID, db: AsyncDbSession):
     """
     Endpoint to retrieve a specific friendship by its unique ID.
 
@@ -67,11 +102,11 @@ def get_friend_by_id(friend_id: UUID, db: Session = Depends(get_db)):
         HTTPException:
             - 404 status code if the friendship is not found.
     """
-    return get_friend_by_id_service(db, friend_id)
+    return await get_friend_by_id_service(db, friend_id)
 
 
 @router.put("/{friend_id}", response_model=FriendsResponse, tags=["Friends"], name="Update Friend")
-def update_friend(friend_id: UUID, update_data: FriendsUpdate, db: Session = Depends(get_db)):
+def update_friend(friend_id: UUID, update_data: FriendsUpdate, db: DbSession):
     """
     Endpoint to update an existing friendship.
 
@@ -92,7 +127,7 @@ def update_friend(friend_id: UUID, update_data: FriendsUpdate, db: Session = Dep
 
 
 @router.delete("/{friend_id}", response_model=FriendsResponse, tags=["Friends"], name="Delete Friend")
-def delete_friend(friend_id: UUID, db: Session = Depends(get_db)):
+def delete_friend(friend_id: UUID, db: DbSession):
     """
     Endpoint to delete a friendship.
 
@@ -110,66 +145,56 @@ def delete_friend(friend_id: UUID, db: Session = Depends(get_db)):
     return delete_friend_service(db, friend_id)
 
 
-@router.get("/status/{user_id}", response_model=list[FriendsResponse], tags=["Friends"], name="Get Friends By Status")
-def get_friends_by_status(
+@router.get("/overview/{user_id}", response_model=FriendsOverviewResponse, tags=["Friends"],
+            name="Get Friends Overview")
+async def get_friends_overview(
+        db: AsyncDbSession,
         user_id: UUID = Path(..., description="L'identifiant de l'utilisateur"),
-        accepted: bool = Query(None, description="Filtrer par demandes acceptées"),
-        declined: bool = Query(None, description="Filtrer par demandes refusées"),
-        include_deleted: bool = Query(False, description="Inclure les amitiés supprimées logiquement"),
-        db: Session = Depends(get_db)
+        include_deleted: IncludeDeleted = False
 ):
     """
-    Endpoint pour récupérer les amitiés d'un utilisateur filtrées par statut.
+    Endpoint pour récupérer l'écran "amis" complet d'un utilisateur en un seul appel :
+    amitiés acceptées, demandes reçues en attente et demandes envoyées en attente.
 
     Args:
         user_id (UUID): L'identifiant unique de l'utilisateur.
-        accepted (bool, optional): Filtrer par demandes acceptées. None = pas de filtre sur ce champ.
-        declined (bool, optional): Filtrer par demandes refusées. None = pas de filtre sur ce champ.
         include_deleted (bool, optional): Si True, inclut les amitiés supprimées. Défaut à False.
         db (Session): Dépendance de session de base de données.
 
     Returns:
-        List[FriendsResponse]: Une liste des amitiés filtrées.
+        FriendsOverviewResponse: Les trois listes accepted / received / sent.
 
     Raises:
         HTTPException: Si une erreur se produit lors de la récupération des amitiés.
     """
-    from app.services.friends import get_friends_by_status_service
-    return get_friends_by_status_service(db, user_id, accepted, declined, include_deleted)
-
-
-@router.get("/pending/{user_id}", response_model=list[FriendsResponse], tags=["Friends"],
-            name="Get Pending Friend Requests")
-def get_pending_friend_requests(
-        user_id: UUID = Path(..., description="L'identifiant de l'utilisateur"),
-        include_deleted: bool = Query(False, description="Inclure les amitiés supprimées logiquement"),
-        db: Session = Depends(get_db)
-):
-    """
-    Endpoint pour récupérer les demandes d'amitié en attente pour un utilisateur.
+    # Réponse cachée et invalidée par événement sur toute écriture Friends
+    # (voir app/cache.py) : les clients mobiles re-pollent cet écran souvent.
+    cache_key = cache.friends_overview_key(user_id)
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
 
-    Args:
-        user_id (UUID): L'identifiant unique de l'utilisateur.
-        include_deleted (bool, optional): Si True, inclut les amitiés supprimées. Défaut à False.
-        db (Session): Dépendance de session de base de données.
+    overview = await get_friends_overview_service(db, user_id, include_deleted)
 
-    Returns:
-        List[FriendsResponse]: Une liste des demandes d'amitié en attente.
-
-    Raises:
-        HTTPException: Si une erreur se produit lors de la récupération des amitiés.
-    """
-    from app.services.friends import get_pending_friends_service
-    return get_pending_friends_service(db, user_id, include_deleted)
+    if not include_deleted:
+        cache.set(cache_key, {
+            bucket: [FriendsResponse.model_validate(f, from_attributes=True).model_dump()
+                     for f in friendships]
+            for bucket, friendships in overview.items()
+        })
+    return overview
 
 
 @router.get("/status/{user_id}", response_model=list[FriendsResponse], tags=["Friends"], name="Get Friends By Status")
-def get_friends_by_status(
+async def get_friends_by_status(
+        db: AsyncDbSession,
         user_id: UUID = Path(..., description="L'identifiant de l'utilisateur"),
         accepted: bool = Query(None, description="Filtrer par demandes acceptées"),
         declined: bool = Query(None, description="Filtrer par demandes refusées"),
-        include_deleted: bool = Query(False, description="Inclure les amitiés supprimées logiquement"),
-        db: Session = Depends(get_db)
+        include_deleted: IncludeDeleted = False,
+        limit: int = Query(50, ge=1, le=200, description="Nombre maximum d'amitiés par page"),
+        offset: int = Query(0, ge=0, description="Nombre d'amitiés à sauter")
 ):
     """
     Endpoint pour récupérer les amitiés d'un utilisateur filtrées par statut.
@@ -187,16 +212,20 @@ def get_friends_by_status(
     Raises:
         HTTPException: Si une erreur se produit lors de la récupération des amitiés.
     """
-    from app.services.friends import get_friends_by_status_service
-    return get_friends_by_status_service(db, user_id, accepted, declined, include_deleted)
+    return _friends_list_response(
+        await get_friends_by_status_service(db, user_id, accepted, declined, include_deleted,
+                                            limit=limit, offset=offset)
+    )
 
 
 @router.get("/pending/{user_id}", response_model=list[FriendsResponse], tags=["Friends"],
             name="Get Pending Friend Requests")
-def get_pending_friend_requests(
+async def get_pending_friend_requests(
+        db: AsyncDbSession,
         user_id: UUID = Path(..., description="L'identifiant de l'utilisateur"),
-        include_deleted: bool = Query(False, description="Inclure les amitiés supprimées logiquement"),
-        db: Session = Depends(get_db)
+        include_deleted: IncludeDeleted = False,
+        limit: int = Query(50, ge=1, le=200, description="Nombre maximum d'amitiés par page"),
+        offset: int = Query(0, ge=0, description="Nombre d'amitiés à sauter")
 ):
     """
     Endpoint pour récupérer les demandes d'amitié en attente pour un utilisateur.
@@ -212,5 +241,7 @@ def get_pending_friend_requests(
     Raises:
         HTTPException: Si une erreur se produit lors de la récupération des amitiés.
     """
-    from app.services.friends import get_pending_friends_service
-    return get_pending_friends_service(db, user_id, include_deleted)
+    return _friends_list_response(
+        await get_pending_friends_service(db, user_id, include_deleted, limit=limit, offset=offset)
+    )
+
@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from app.data_base import get_db
+from fastapi import APIRouter, BackgroundTasks, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from app.data_base import DbSession, AsyncDbSession
 from app.schemas import GameCreate, GameResponse, GameUpdate
 from app.services.games import (
     create_game_service,
     get_all_games_service,
+    stream_all_games_service,
     get_game_by_id_service,
     update_game_service,
     delete_game_service,
     restore_game_service
 )
+from app import cache
+from app.utils.streaming import ndjson_stream
 from uuid import UUID
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateur construit une fois à l'import : sérialise la liste des jeux en
+# un seul passage, et produit un payload JSON-compatible directement
+# stockable dans le cache applicatif.
+_games_list_adapter = TypeAdapter(list[GameResponse])
+_game_adapter = TypeAdapter(GameResponse)
+
 @router.post("/", response_model=GameResponse, tags=["Games"], name="Create Games")
-def create_game(game: GameCreate, db: Session = Depends(get_db)):
+def create_game(game: GameCreate, db: DbSession):
     """
     Endpoint to create a new game.
 
@@ -34,9 +45,10 @@ def create_game(game: GameCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[GameResponse], tags=["Games"], name="Get Games")
-def get_all_games(
-    include_deleted: bool = Query(False, description="Include soft-deleted games"),
-    db: Session = Depends(get_db)
+async def get_all_games(
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False,
+    stream: bool = Query(False, description="Stream the response as NDJSON instead of a JSON array")
 ):
     """
     Endpoint to retrieve all games.
@@ -51,14 +63,34 @@ def get_all_games(
     Raises:
         HTTPException: If an error occurs while fetching the games (optional, if implemented).
     """
-    return get_all_games_service(db, include_deleted)
+    if stream:
+        rows = await stream_all_games_service(db, include_deleted)
+        return StreamingResponse(ndjson_stream(rows, _game_adapter),
+                                 media_type="application/x-ndjson")
+
+    # La liste des jeux change rarement : servie depuis le cache applicatif,
+    # invalidée par événement sur toute écriture Games (voir app/cache.py).
+    cache_key = cache.games_list_key()
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+
+    games = await get_all_games_service(db, include_deleted)
+    payload = _games_list_adapter.dump_python(
+        _games_list_adapter.validate_python(games, from_attributes=True),
+        mode="json",
+    )
+    if not include_deleted:
+        cache.set(cache_key, payload)
+    return ORJSONResponse(payload)
 
 
 @router.get("/{game_id}", response_model=GameResponse, tags=["Games"], name="Get Games by id")
-def get_game_by_id(
+async def get_game_by_id(
     game_id: UUID,
-    include_deleted: bool = Query(False, description="Include soft-deleted games"),
-    db: Session = Depends(get_db)
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve a game by its unique ID.
@@ -75,11 +107,11 @@ def get_game_by_id(
         HTTPException:
             - 404 status code if the game is not found.
     """
-    return get_game_by_id_service(db, game_id, include_deleted)
+    return await get_game_by_id_service(db, game_id, include_deleted)
 
 
 @router.put("/{game_id}", response_model=GameResponse, tags=["Games"], name="Update Games")
-def update_game(game_id: UUID, game: GameUpdate, db: Session = Depends(get_db)):
+def update_game(game_id: UUID, game: GameUpdate, db: DbSession):
     """
     Endpoint to update an existing game.
 
@@ -100,8 +132,9 @@ def update_game(game_id: UUID, game: GameUpdate, db: Session = Depends(get_db)):
 @router.delete("/{game_id}", tags=["Games"], name="Delete Games")
 def delete_game(
     game_id: UUID,
-    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete"),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: DbSession,
+    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete")
 ):
     """
     Endpoint to delete an existing game.
@@ -117,11 +150,11 @@ def delete_game(
     Raises:
         HTTPException: If the game is not found or the deletion fails.
     """
-    return delete_game_service(db, game_id, hard_delete)
+    return delete_game_service(db, game_id, hard_delete, background_tasks)
 
 
 @router.post("/{game_id}/restore", response_model=GameResponse, tags=["Games"], name="Restore Deleted Game")
-def restore_game(game_id: UUID, db: Session = Depends(get_db)):
+def restore_game(game_id: UUID, db: DbSession):
     """
     Endpoint to restore a soft-deleted game.
 
@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from app.data_base import get_db
+from fastapi import APIRouter, BackgroundTasks, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from app.data_base import DbSession, AsyncDbSession
 from app.schemas import PartyCreate, PartyResponse, PartyUpdate
 from app.services.parties import (
     create_party_service,
     get_all_parties_service,
+    stream_all_parties_service,
     get_party_by_id_service,
     update_party_service,
     delete_party_service,
     restore_party_service
 )
+from app.utils.streaming import ndjson_stream
 from uuid import UUID
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateurs construits une fois à l'import : sérialisation en flux (ligne
+# à ligne) et en liste (un seul passage, sans re-validation FastAPI).
+_party_adapter = TypeAdapter(PartyResponse)
+_party_list_adapter = TypeAdapter(list[PartyResponse])
+
 @router.post("/", response_model=PartyResponse, tags=["Parties"], name="Create Parties")
-def create_party(party: PartyCreate, db: Session = Depends(get_db)):
+def create_party(party: PartyCreate, db: DbSession):
     """
     Endpoint to create a new party.
 
@@ -34,9 +43,10 @@ def create_party(party: PartyCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[PartyResponse], tags=["Parties"], name="Get all Parties")
-def get_all_parties(
-    include_deleted: bool = Query(False, description="Include soft-deleted parties"),
-    db: Session = Depends(get_db)
+async def get_all_parties(
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False,
+    stream: bool = Query(False, description="Stream the response as NDJSON instead of a JSON array")
 ):
     """
     Endpoint to retrieve all parties.
@@ -51,14 +61,25 @@ def get_all_parties(
     Raises:
         HTTPException: If an error occurs while fetching the parties (optional, if implemented).
     """
-    return get_all_parties_service(db, include_deleted)
+    if stream:
+        rows = await stream_all_parties_service(db, include_deleted)
+        return StreamingResponse(ndjson_stream(rows, _party_adapter),
+                                 media_type="application/x-ndjson")
+
+    rows = await get_all_parties_service(db, include_deleted)
+    return ORJSONResponse(
+        _party_list_adapter.dump_python(
+            _party_list_adapter.validate_python(rows, from_attributes=True),
+            mode="json",
+        )
+    )
 
 
 @router.get("/{party_id}", response_model=PartyResponse, tags=["Parties"], name="Get Parties By Id")
-def get_party_by_id(
+async def get_party_by_id(
     party_id: UUID,
-    include_deleted: bool = Query(False, description="Include soft-deleted parties"),
-    db: Session = Depends(get_db)
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve a party by its unique ID.
@@ -75,11 +96,11 @@ def get_party_by_id(
         HTTPException:
             - 404 status code if the party is not found.
     """
-    return get_party_by_id_service(db, party_id, include_deleted)
+    return await get_party_by_id_service(db, party_id, include_deleted)
 
 
 @router.put("/{party_id}", response_model=PartyResponse, tags=["Parties"], name="Update Parties")
-def update_party(party_id: UUID, party: PartyUpdate, db: Session = Depends(get_db)):
+def update_party(party_id: UUID, party: PartyUpdate, db: DbSession):
     """
     Endpoint to update an existing party.
 
@@ -100,8 +121,9 @@ def update_party(party_id: UUID, party: PartyUpdate, db: Session = Depends(get_d
 @router.delete("/{party_id}", tags=["Parties"], name="Delete Parties")
 def delete_party(
     party_id: UUID,
-    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete"),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: DbSession,
+    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete")
 ):
     """
     Endpoint to delete an existing party.
@@ -117,11 +139,11 @@ def delete_party(
     Raises:
         HTTPException: If the party is not found or the deletion fails.
     """
-    return delete_party_service(db, party_id, hard_delete)
+    return delete_party_service(db, party_id, hard_delete, background_tasks)
 
 
 @router.post("/{party_id}/restore", response_model=PartyResponse, tags=["Parties"], name="Restore Deleted Party")
-def restore_party(party_id: UUID, db: Session = Depends(get_db)):
+def restore_party(party_id: UUID, db: DbSession):
     """
     Endpoint to restore a soft-deleted party.
 
@@ -1,21 +1,30 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from app.data_base import get_db
+from fastapi import APIRouter, BackgroundTasks, Query
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from app.data_base import DbSession, AsyncDbSession
 from app.schemas import PaymentCreate, PaymentResponse, PaymentUpdate
 from app.services.payments import (
     create_payment_service,
     get_all_payments_service,
+    stream_all_payments_service,
     get_payment_by_id_service,
     update_payment_service,
     delete_payment_service,
     restore_payment_service
 )
+from app.utils.streaming import ndjson_stream
 from uuid import UUID
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateurs construits une fois à l'import : sérialisation en flux (ligne
+# à ligne) et en liste (un seul passage, sans re-validation FastAPI).
+_payment_adapter = TypeAdapter(PaymentResponse)
+_payment_list_adapter = TypeAdapter(list[PaymentResponse])
+
 @router.post("/", response_model=PaymentResponse, tags=["Payments"], name="Create Payments")
-def create_payment(payment: PaymentCreate, db: Session = Depends(get_db)):
+def create_payment(payment: PaymentCreate, db: DbSession):
     """
     Endpoint to create a new payment.
 
@@ -34,9 +43,10 @@ def create_payment(payment: PaymentCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=list[PaymentResponse], tags=["Payments"], name="Get Payments")
-def get_all_payments(
-    include_deleted: bool = Query(False, description="Include soft-deleted payments"),
-    db: Session = Depends(get_db)
+async def get_all_payments(
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False,
+    stream: bool = Query(False, description="Stream the response as NDJSON instead of a JSON array")
 ):
     """
     Endpoint to retrieve all payments.
@@ -51,14 +61,25 @@ def get_all_payments(
     Raises:
         HTTPException: If an error occurs while fetching the payments (optional, if implemented).
     """
-    return get_all_payments_service(db, include_deleted)
+    if stream:
+        rows = await stream_all_payments_service(db, include_deleted)
+        return StreamingResponse(ndjson_stream(rows, _payment_adapter),
+                                 media_type="application/x-ndjson")
+
+    rows = await get_all_payments_service(db, include_deleted)
+    return ORJSONResponse(
+        _payment_list_adapter.dump_python(
+            _payment_list_adapter.validate_python(rows, from_attributes=True),
+            mode="json",
+        )
+    )
 
 
 @router.get("/{payment_id}", response_model=PaymentResponse, tags=["Payments"], name="Get Payments by id")
-def get_payment_by_id(
+async def get_payment_by_id(
     payment_id: UUID,
-    include_deleted: bool = Query(False, description="Include soft-deleted payments"),
-    db: Session = Depends(get_db)
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve a payment by its unique ID.
@@ -75,11 +96,11 @@ def get_payment_by_id(
         HTTPException:
             - 404 status code if the payment is not found.
     """
-    return get_payment_by_id_service(db, payment_id, include_deleted)
+    return await get_payment_by_id_service(db, payment_id, include_deleted)
 
 
 @router.put("/{payment_id}", response_model=PaymentResponse, tags=["Payments"], name="Update Payments")
-def update_payment(payment_id: UUID, payment: PaymentUpdate, db: Session = Depends(get_db)):
+def update_payment(payment_id: UUID, payment: PaymentUpdate, db: DbSession):
     """
     Endpoint to update an existing payment.
 
@@ -100,8 +121,9 @@ def update_payment(payment_id: UUID, payment: PaymentUpdate, db: Session = Depen
 @router.delete("/{payment_id}", tags=["Payments"], name="Delete Payments")
 def delete_payment(
     payment_id: UUID,
-    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete"),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    db: DbSession,
+    hard_delete: bool = Query(False, description="Perform hard delete instead of soft delete")
 ):
     """
     Endpoint to delete an existing payment.
@@ -117,11 +139,11 @@ def delete_payment(
     Raises:
         HTTPException: If the payment is not found or the deletion fails.
     """
-    return delete_payment_service(db, payment_id, hard_delete)
+    return delete_payment_service(db, payment_id, hard_delete, background_tasks)
 
 
 @router.post("/{payment_id}/restore", response_model=PaymentResponse, tags=["Payments"], name="Restore Deleted Payment")
-def restore_payment(payment_id: UUID, db: Session = Depends(get_db)):
+def restore_payment(payment_id: UUID, db: DbSession):
     """
     Endpoint to restore a soft-deleted payment.
 
@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+import hashlib
+
+from fastapi import APIRouter, Query, Request, Response
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
 from typing import List, Optional
-from app.data_base import get_db
+from app.data_base import DbSession, AsyncDbSession
 from app.schemas import PromoCodeCreate, PromoCodeResponse, PromoCodeUpdate, PromoCodeUse, PromoCodeUsageResponse
 from app.services.promoCode import (
     create_promo_code_service,
@@ -11,15 +14,26 @@ from app.services.promoCode import (
     update_promo_code_service,
     delete_promo_code_service,
     use_promo_code_service,
-    generate_promo_code,
+    generate_unique_promo_code,
     restore_promo_code_service
 )
 from uuid import UUID
 
+from app import cache
+from app.depends.params import IncludeDeleted
+
 router = APIRouter()
 
+# Adaptateur construit une fois à l'import pour la liste des codes promo.
+_promo_list_adapter = TypeAdapter(List[PromoCodeResponse])
+
+
+def _etag_for(payload: bytes) -> str:
+    """ETag faible dérivé du contenu : les bornes re-pollent le même code souvent."""
+    return f'"{hashlib.md5(payload).hexdigest()}"'
+
 @router.post("/", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Create Promo Code")
-def create_promo_code(promo_code: PromoCodeCreate, db: Session = Depends(get_db)):
+def create_promo_code(promo_code: PromoCodeCreate, db: DbSession):
     """
     Endpoint pour créer un nouveau code promo.
 
@@ -39,9 +53,9 @@ def create_promo_code(promo_code: PromoCodeCreate, db: Session = Depends(get_db)
 
 @router.post("/generate", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Generate Random Promo Code")
 def generate_random_promo_code(
+    db: DbSession,
     nb_parties: int = Query(1, gt=0),
-    length: int = Query(8, ge=6, le=12),
-    db: Session = Depends(get_db)
+    length: int = Query(8, ge=6, le=12)
 ):
     """
     Endpoint pour générer un code promo aléatoire.
@@ -54,16 +68,16 @@ def generate_random_promo_code(
     Returns:
         PromoCodeResponse: Les informations du code promo généré.
     """
-    code = generate_promo_code(length)
+    code = generate_unique_promo_code(db, length)
     promo_data = PromoCodeCreate(code=code, nb_parties=nb_parties)
     return create_promo_code_service(db, promo_data)
 
 
 @router.get("/", response_model=List[PromoCodeResponse], tags=["Promo_Codes"], name="Get All Promo Codes")
-def get_all_promo_codes(
+async def get_all_promo_codes(
+    db: AsyncDbSession,
     include_inactive: bool = Query(False, description="Inclure les codes promo inactifs"),
-    include_deleted: bool = Query(False, description="Inclure les codes promo supprimés logiquement"),
-    db: Session = Depends(get_db)
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint pour récupérer tous les codes promo.
@@ -76,14 +90,33 @@ def get_all_promo_codes(
     Returns:
         List[PromoCodeResponse]: Une liste de tous les codes promo.
     """
-    return get_all_promo_codes_service(db, include_inactive, include_deleted)
+    # Liste servie depuis le cache applicatif pour le cas courant (codes
+    # actifs, non supprimés) ; invalidée par événement sur toute écriture
+    # PromoCodes (voir app/cache.py).
+    cacheable = not include_inactive and not include_deleted
+    cache_key = cache.promo_codes_list_key()
+    if cacheable:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return ORJSONResponse(cached)
+
+    promo_codes = await get_all_promo_codes_service(db, include_inactive, include_deleted)
+    payload = _promo_list_adapter.dump_python(
+        _promo_list_adapter.validate_python(promo_codes, from_attributes=True),
+        mode="json",
+    )
+    if cacheable:
+        cache.set(cache_key, payload)
+    return ORJSONResponse(payload)
 
 
 @router.get("/{promo_code_id}", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Get Promo Code by ID")
-def get_promo_code_by_id(
+async def get_promo_code_by_id(
     promo_code_id: UUID,
-    include_deleted: bool = Query(False, description="Inclure les codes promo supprimés logiquement"),
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint pour récupérer un code promo spécifique par son ID.
@@ -100,14 +133,22 @@ def get_promo_code_by_id(
         HTTPException:
             - Code 404 si le code promo n'est pas trouvé.
     """
-    return get_promo_code_by_id_service(db, promo_code_id, include_deleted)
+    promo_code = await get_promo_code_by_id_service(db, promo_code_id, include_deleted)
+
+    # ETag basé sur updated_at : un 304 épargne sérialisation et octets
+    # réseau aux clients qui re-pollent la même ressource.
+    etag = _etag_for(f"{promo_code.id}:{promo_code.updated_at}".encode())
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    response.headers["ETag"] = etag
+    return promo_code
 
 
 @router.get("/code/{code}", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Get Promo Code by Code")
-def get_promo_code_by_code(
+async def get_promo_code_by_code(
     code: str,
-    include_deleted: bool = Query(False, description="Inclure les codes promo supprimés logiquement"),
-    db: Session = Depends(get_db)
+    db: AsyncDbSession,
+    include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint pour récupérer un code promo spécifique par son code.
@@ -124,11 +165,23 @@ def get_promo_code_by_code(
         HTTPException:
             - Code 404 si le code promo n'est pas trouvé.
     """
-    return get_promo_code_by_code_service(db, code, include_deleted)
+    # Lookup par code très re-pollé côté borne : mis en cache par code et
+    # purgé dès que le code promo est modifié ou consommé.
+    cache_key = cache.promo_code_by_code_key(code.upper())
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    promo_code = await get_promo_code_by_code_service(db, code, include_deleted)
+    if not include_deleted:
+        cache.set(cache_key,
+                  PromoCodeResponse.model_validate(promo_code, from_attributes=True).model_dump())
+    return promo_code
 
 
 @router.put("/{promo_code_id}", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Update Promo Code")
-def update_promo_code(promo_code_id: UUID, promo_code: PromoCodeUpdate, db: Session = Depends(get_db)):
+def update_promo_code(promo_code_id: UUID, promo_code: PromoCodeUpdate, db: DbSession):
     """
     Endpoint pour mettre à jour un code promo existant.
 
@@ -151,8 +204,8 @@ def update_promo_code(promo_code_id: UUID, promo_code: PromoCodeUpdate, db: Sess
 @router.delete("/{promo_code_id}", tags=["Promo_Codes"], name="Delete Promo Code")
 def delete_promo_code(
     promo_code_id: UUID,
-    hard_delete: bool = Query(False, description="Supprimer définitivement le code promo"),
-    db: Session = Depends(get_db)
+    db: DbSession,
+    hard_delete: bool = Query(False, description="Supprimer définitivement le code promo")
 ):
     """
     Endpoint pour supprimer un code promo existant.
@@ -173,7 +226,7 @@ def delete_promo_code(
 
 
 @router.post("/{promo_code_id}/restore", response_model=PromoCodeResponse, tags=["Promo_Codes"], name="Restore Deleted Promo Code")
-def restore_promo_code(promo_code_id: UUID, db: Session = Depends(get_db)):
+def restore_promo_code(promo_code_id: UUID, db: DbSession):
     """
     Endpoint pour restaurer un code promo supprimé logiquement.
 
@@ -193,7 +246,7 @@ def restore_promo_code(promo_code_id: UUID, db: Session = Depends(get_db)):
 
 
 @router.post("/use", response_model=PromoCodeUsageResponse, tags=["Promo_Codes"], name="Use Promo Code")
-def use_promo_code(promo_code_use: PromoCodeUse, db: Session = Depends(get_db)):
+def use_promo_code(promo_code_use: PromoCodeUse, db: DbSession):
     """
     Endpoint pour utiliser un code promo et attribuer des tickets à un utilisateur.
 
@@ -1,19 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.data_base import get_db
-from app.schemas import UserResponse, UserCreate
-from app.services.user import create_user_service, get_users_service, get_user_by_id_service, update_user_service, \
-    delete_user_service
+import hashlib
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import TypeAdapter
+from app.data_base import AsyncDbSession, DbSession
+from app.schemas import UserResponse, UserCreate, UsersBatchRequest
+from app.services.user import create_user_service, get_users_service, get_user_by_id_service, \
+    get_users_batch_service, stream_all_users_service, update_user_service, delete_user_service
+from sqlalchemy import select, update
 from app.models import Users
 from typing import List
 from uuid import UUID
-from app.utils.db_utils import filter_deleted, soft_delete
+from app.utils.db_utils import filter_deleted_stmt
+from app.utils.streaming import ndjson_stream
+from app import cache
+from app.depends.params import IncludeDeleted
 
 router = APIRouter()
 
+# Adaptateur construit une fois à l'import : la liste complète est validée et
+# sérialisée en une seule passe C au lieu d'un modèle Pydantic par ligne.
+_user_list_adapter = TypeAdapter(List[UserResponse])
+_user_adapter = TypeAdapter(UserResponse)
+
+
+def _etag_for(payload: bytes) -> str:
+    """ETag faible dérivé du contenu : les clients re-pollent le même id souvent."""
+    return f'"{hashlib.md5(payload).hexdigest()}"'
+
 
 @router.post("/", response_model=UserResponse, tags=["Users"], name="Create User")
-def create_new_user(user: UserCreate, db: Session = Depends(get_db)):
+def create_new_user(user: UserCreate, db: DbSession):
     """
         Endpoint to create a new user.
 
@@ -28,18 +45,17 @@ def create_new_user(user: UserCreate, db: Session = Depends(get_db)):
             HTTPException:
                 - 400 status code if a user with the given Firebase ID already exists.
         """
-    db_user = db.query(Users).filter(Users.firebase_id == user.firebase_id).first()
-    if db_user:
-        raise HTTPException(status_code=400, detail="User with this Firebase ID already exists")
-
+    # Pas de SELECT préalable : l'index unique sur firebase_id arbitre le
+    # conflit dans l'INSERT lui-même, le service traduit la violation en 400.
     db_user = create_user_service(db, user)  # Appelle la fonction d'insertion
     return db_user
 
 
 @router.get("/", response_model=List[UserResponse], tags=["Users"], name="Get User")
-def get_all_users(
-        include_deleted: bool = Query(False, description="Inclure les utilisateurs supprimés"),
-        db: Session = Depends(get_db)
+async def get_all_users(
+        db: AsyncDbSession,
+        include_deleted: IncludeDeleted = False,
+        stream: bool = Query(False, description="Streamer la réponse en NDJSON plutôt qu'en tableau JSON")
 ):
     """
     Endpoint to retrieve all users.
@@ -54,15 +70,60 @@ def get_all_users(
     Raises:
         HTTPException: If an error occurs while fetching the users (optional, if implemented).
     """
-    users = get_users_service(db, include_deleted)
-    return users
+    if stream:
+        # Curseur serveur par lots de 500 : la mémoire reste bornée quelle
+        # que soit la taille de la table et le premier octet part tôt.
+        rows = await stream_all_users_service(db, include_deleted)
+        return StreamingResponse(ndjson_stream(rows, _user_adapter),
+                                 media_type="application/x-ndjson")
+
+    users = await get_users_service(db, include_deleted)
+    return ORJSONResponse(
+        _user_list_adapter.dump_python(
+            _user_list_adapter.validate_python(users, from_attributes=True),
+            mode="json",
+        )
+    )
+
+
+@router.post("/batch", tags=["Users"], name="Get Users Batch")
+async def get_users_batch(batch: UsersBatchRequest, db: AsyncDbSession):
+    """
+    Endpoint de résolution groupée : plusieurs ids et/ou identifiants Firebase
+    en un seul appel HTTP et un seul SELECT, au lieu de N GET unitaires.
+
+    Args:
+        batch (UsersBatchRequest): Les listes d'ids et de firebase_ids à résoudre.
+        db (Session): Session de base de données.
+
+    Returns:
+        dict: {"users": {id: UserResponse}, "firebase_users": {firebase_id: UserResponse}} —
+        les clés inconnues sont simplement absentes des deux dictionnaires.
+    """
+    users = await get_users_batch_service(db, batch.ids, batch.firebase_ids)
+
+    wanted_ids = {str(i) for i in batch.ids}
+    wanted_firebase = set(batch.firebase_ids)
+    by_id = {}
+    by_firebase = {}
+    for user in users:
+        payload = _user_adapter.dump_python(
+            _user_adapter.validate_python(user, from_attributes=True), mode="json"
+        )
+        if str(user.id) in wanted_ids:
+            by_id[str(user.id)] = payload
+        if user.firebase_id in wanted_firebase:
+            by_firebase[user.firebase_id] = payload
+    return ORJSONResponse({"users": by_id, "firebase_users": by_firebase})
 
 
 @router.get("/{user_id}", response_model=UserResponse, tags=["Users"], name="Get User by id")
-def get_user_by_id(
+async def get_user_by_id(
         user_id: UUID,
-        include_deleted: bool = Query(False, description="Inclure les utilisateurs supprimés"),
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        db: AsyncDbSession,
+        include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint to retrieve a user by their unique ID.
@@ -78,14 +139,38 @@ def get_user_by_id(
     Raises:
         HTTPException: If the user is not found (404 status).
     """
-    user = get_user_by_id_service(db, user_id, include_deleted)
+    # Lecture par clé très fréquente côté mobile : servie depuis le cache
+    # applicatif, purgé par événement sur toute écriture Users.
+    cache_key = cache.user_by_id_key(user_id)
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if request.headers.get("if-none-match") == cached["etag"]:
+                return Response(status_code=304)
+            response.headers["ETag"] = cached["etag"]
+            return cached["payload"]
+
+    user = await get_user_by_id_service(db, user_id, include_deleted)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
+
+    # ETag basé sur updated_at : si le client a déjà la version courante,
+    # un 304 évite sérialisation, encodage JSON et octets réseau.
+    etag = _etag_for(f"{user.id}:{user.updated_at}".encode())
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    response.headers["ETag"] = etag
+
+    if not include_deleted:
+        cache.set(cache_key, {
+            "etag": etag,
+            "payload": UserResponse.model_validate(user, from_attributes=True).model_dump(),
+        })
     return user
 
 
 @router.put("/{user_id}", response_model=UserResponse, tags=["Users"], name="Update User")
-def update_user(user_id: UUID, user: UserCreate, db: Session = Depends(get_db)):
+def update_user(user_id: UUID, user: UserCreate, db: DbSession):
     """
     Endpoint to update an existing user.
 
@@ -110,8 +195,8 @@ def update_user(user_id: UUID, user: UserCreate, db: Session = Depends(get_db)):
 @router.delete("/{user_id}", response_model=UserResponse, tags=["Users"], name="Delete User")
 def delete_user(
         user_id: UUID,
-        hard_delete: bool = Query(False, description="Supprimer définitivement l'utilisateur"),
-        db: Session = Depends(get_db)
+        db: DbSession,
+        hard_delete: bool = Query(False, description="Supprimer définitivement l'utilisateur")
 ):
     """
     Endpoint to delete an existing user.
@@ -131,7 +216,7 @@ def delete_user(
 
 
 @router.post("/{user_id}/restore", response_model=UserResponse, tags=["Users"], name="Restore Deleted User")
-def restore_user(user_id: UUID, db: Session = Depends(get_db)):
+def restore_user(user_id: UUID, db: DbSession):
     """
     Endpoint to restore a soft-deleted user.
 
@@ -147,30 +232,35 @@ def restore_user(user_id: UUID, db: Session = Depends(get_db)):
             - 404: If the user is not found.
             - 400: If the user is not deleted.
     """
-    # Récupérer l'utilisateur, y compris s'il est supprimé
-    user = get_user_by_id_service(db, user_id, include_deleted=True)
-
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Une seule requête sur le chemin nominal : le WHERE exige is_deleted=true
+    # et le RETURNING dit si une ligne a été restaurée.
+    user = db.execute(
+        update(Users)
+        .where(Users.id == user_id, Users.is_deleted.is_(True))
+        .values(is_deleted=False, deleted_at=None)
+        .returning(Users)
+    ).scalar_one_or_none()
 
-    if not user.is_deleted:
+    if user is None:
+        db.rollback()
+        # Relire uniquement pour distinguer "inexistant" de "pas supprimé".
+        existing = db.get(Users, user_id, execution_options={"include_deleted": True})
+        if not existing:
+            raise HTTPException(status_code=404, detail="User not found")
         raise HTTPException(status_code=400, detail="User is not deleted")
 
-    # Restaurer l'utilisateur
-    user.is_deleted = False
-    user.deleted_at = None
     db.commit()
-    db.refresh(user)
-
     return user
 
 
 # app/routes/user.py (ajoutez ce nouvel endpoint)
 @router.get("/firebase/{firebase_id}", response_model=UserResponse, tags=["Users"], name="Get User by Firebase ID")
-def get_user_by_firebase_id(
+async def get_user_by_firebase_id(
         firebase_id: str,
-        include_deleted: bool = Query(False, description="Inclure les utilisateurs supprimés"),
-        db: Session = Depends(get_db)
+        request: Request,
+        response: Response,
+        db: AsyncDbSession,
+        include_deleted: IncludeDeleted = False
 ):
     """
     Endpoint pour récupérer un utilisateur par son identifiant Firebase.
@@ -186,11 +276,32 @@ def get_user_by_firebase_id(
     Raises:
         HTTPException: Si l'utilisateur n'est pas trouvé (404 status).
     """
-    query = db.query(Users).filter(Users.firebase_id == firebase_id)
-    query = filter_deleted(query, include_deleted)
-    user = query.first()
+    # Lookup très chaud et quasi immuable (firebase_id → utilisateur) :
+    # servi depuis le cache, invalidé par événement sur toute écriture Users.
+    cache_key = cache.user_by_firebase_key(firebase_id)
+    if not include_deleted:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if request.headers.get("if-none-match") == cached["etag"]:
+                return Response(status_code=304)
+            response.headers["ETag"] = cached["etag"]
+            return cached["payload"]
+
+    stmt = select(Users).where(Users.firebase_id == firebase_id)
+    stmt = filter_deleted_stmt(stmt, Users, include_deleted)
+    user = (await db.execute(stmt)).scalar_one_or_none()
 
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
 
+    etag = _etag_for(f"{user.id}:{user.updated_at}".encode())
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304)
+    response.headers["ETag"] = etag
+
+    if not include_deleted:
+        cache.set(cache_key, {
+            "etag": etag,
+            "payload": UserResponse.model_validate(user, from_attributes=True).model_dump(),
+        })
     return user
\ No newline at end of file
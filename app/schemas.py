@@ -1,8 +1,7 @@
-from pydantic import BaseModel, Field, ConfigDict, validator
-from typing import Optional
+from pydantic import BaseModel, Field, ConfigDict, StringConstraints
+from typing import Annotated, Any, Optional
 from uuid import UUID
 from datetime import datetime
-import re
 
 # Users Schema
 class UserBase(BaseModel):
@@ -11,6 +10,12 @@ class UserBase(BaseModel):
     nb_ticket: int = Field(0)
     bar: Optional[bool] = Field(False)
 
+class UsersBatchRequest(BaseModel):
+    """Résolution groupée d'utilisateurs : par id et/ou par identifiant Firebase."""
+    ids: list[UUID] = Field(default_factory=list, max_length=100)
+    firebase_ids: list[str] = Field(default_factory=list, max_length=100)
+
+
 class UserCreate(UserBase):
     firebase_id: str
 
@@ -19,8 +24,7 @@ class UserResponse(UserBase):
     publique_id: str
     firebase_id: str
 
-    class ConfigDict :
-        model_config = ConfigDict(from_attributes = True)
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Arcade Machines Schema
@@ -47,8 +51,7 @@ class ArcadeMachineUpdate(BaseModel):
 class ArcadeMachineResponse(ArcadeMachineBase):
     id: UUID
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Games Schema
@@ -70,8 +73,7 @@ class GameUpdate(BaseModel):
 class GameResponse(GameBase):
     id: UUID
 
-    class ConfigDict :
-        model_config = ConfigDict(from_attributes = True)
+    model_config = ConfigDict(from_attributes=True)
 
 
 # Friends Schema
@@ -93,8 +95,13 @@ class FriendsUpdate(BaseModel):
 class FriendsResponse(FriendsBase):
     id: UUID
 
-    class ConfigDict :
-        model_config = ConfigDict(from_attributes = True)
+    model_config = ConfigDict(from_attributes=True)
+
+
+class FriendsOverviewResponse(BaseModel):
+    accepted: list[FriendsResponse]
+    received: list[FriendsResponse]
+    sent: list[FriendsResponse]
 
 
 # Payments Schema
@@ -115,8 +122,7 @@ class PaymentUpdate(BaseModel):
 class PaymentResponse(PaymentBase):
     id: UUID
 
-    class ConfigDict :
-        model_config = ConfigDict(from_attributes = True)
+    model_config = ConfigDict(from_attributes=True)
 
 # Parties Schema
 class PartyBase(BaseModel):
@@ -147,55 +153,65 @@ class PartyUpdate(BaseModel):
 class PartyResponse(PartyBase):
     id: UUID
 
-    class ConfigDict :
-        model_config = ConfigDict(from_attributes = True)
+    model_config = ConfigDict(from_attributes=True)
 
 #Promo code
+# Normalisation et validation du code entièrement dans le coeur compilé de
+# Pydantic : pas de callback Python par requête.
+PromoCode = Annotated[str, StringConstraints(
+    strip_whitespace=True, to_upper=True, pattern=r'^[A-Za-z0-9]+$',
+    min_length=6, max_length=12,
+)]
+
+
 class PromoCodeBase(BaseModel):
-    code: str = Field(..., min_length=6, max_length=12)
+    code: PromoCode
     nb_parties: int = Field(1, gt=0)
     is_active: bool = Field(True)
     expires_at: Optional[datetime] = Field(None)
     max_uses: Optional[int] = Field(None, gt=0)
 
-    @validator('code')
-    def validate_code(cls, v):
-        if not re.match(r'^[A-Za-z0-9]+$', v):
-            raise ValueError('Le code promo doit être alphanumérique (lettres et chiffres uniquement)')
-        return v.upper()  # Convertir en majuscules pour la cohérence
-
 class PromoCodeCreate(PromoCodeBase):
     pass
 
 class PromoCodeUpdate(BaseModel):
-    code: Optional[str] = Field(None, min_length=6, max_length=12)
+    code: Optional[PromoCode] = None
     nb_parties: Optional[int] = Field(None, gt=0)
     is_active: Optional[bool] = None
     expires_at: Optional[datetime] = None
     max_uses: Optional[int] = Field(None, gt=0)
 
-    @validator('code')
-    def validate_code(cls, v):
-        if v is None:
-            return v
-        if not re.match(r'^[A-Za-z0-9]+$', v):
-            raise ValueError('Le code promo doit être alphanumérique (lettres et chiffres uniquement)')
-        return v.upper()  # Convertir en majuscules pour la cohérence
-
 class PromoCodeResponse(PromoCodeBase):
     id: UUID
     created_at: datetime
     used_count: int
 
-    class ConfigDict:
-        model_config = ConfigDict(from_attributes=True)
+    model_config = ConfigDict(from_attributes=True)
 
 # Pour la vérification/utilisation du code promo
 class PromoCodeUse(BaseModel):
-    code: str = Field(..., min_length=6, max_length=12)
+    code: PromoCode
     user_id: UUID
 
 class PromoCodeUsageResponse(BaseModel):
     success: bool
     message: str
-    nb_parties: Optional[int] = None
\ No newline at end of file
+    nb_parties: Optional[int] = None
+
+# Batch Schema
+class BatchSubRequest(BaseModel):
+    id: str
+    method: str = Field(..., pattern=r"^(?i:GET|POST|PUT|DELETE)$")
+    url: str = Field(..., pattern=r"^/")
+    body: Optional[dict] = None
+
+class BatchRequest(BaseModel):
+    requests: list[BatchSubRequest] = Field(..., min_length=1, max_length=20)
+
+class BatchSubResponse(BaseModel):
+    id: str
+    status: int
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: list[BatchSubResponse]
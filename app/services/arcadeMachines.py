@@ -1,9 +1,28 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload
 from app.models import ArcadeMachines
 from app.schemas import ArcadeMachineCreate, ArcadeMachineUpdate
 from uuid import UUID
 from fastapi import HTTPException
-from app.utils.db_utils import filter_deleted, soft_delete
+from app.utils.db_utils import filter_deleted_stmt, soft_delete
+from app import cache
+
+
+# Projection construite une fois à l'import : les listes ne sérialisent que
+# les colonnes scalaires d'ArcadeMachineResponse, inutile d'hydrater des
+# entités ORM complètes (identity map, suivi d'état) pour les jeter aussitôt.
+# Les attributs ORM (et non __table__.c) gardent le filtre global de
+# suppression logique actif sur ces SELECT.
+_ARCADE_COLS = (ArcadeMachines.id, ArcadeMachines.name, ArcadeMachines.description,
+                ArcadeMachines.localisation, ArcadeMachines.game1_id, ArcadeMachines.game2_id)
+
+# Lecture par id précompilée à l'import (même motif que les instructions
+# chaudes de friends.py) : la construction select()/where() Python sort du
+# chemin critique et la clé du cache de compilation est résolue en O(1).
+# Seul le chemin courant include_deleted=False est précompilé.
+_MACHINE_BY_ID_STMT = (select(ArcadeMachines).options(raiseload("*"))
+                       .where(ArcadeMachines.id == bindparam("mid")))
 
 
 def create_arcade_machine_service(db: Session, machine: ArcadeMachineCreate):
@@ -20,32 +39,72 @@ def create_arcade_machine_service(db: Session, machine: ArcadeMachineCreate):
     new_machine = ArcadeMachines(**machine.model_dump())
     db.add(new_machine)
     db.commit()
-    db.refresh(new_machine)
     return new_machine
 
 
-def get_all_arcade_machines_service(db: Session, include_deleted: bool = False):
+def bulk_create_arcade_machines_service(db: Session, machines):
+    """
+    Insère un lot de bornes d'arcade en un seul passage.
+
+    La forme executemany de Core (insert + liste de paramètres) s'appuie sur
+    insertmanyvalues : un nombre borné d'allers-retours quel que soit le
+    nombre de lignes, et un seul commit en fin de lot — là où une boucle de
+    create unitaires paierait un flush et un commit par borne.
+
+    Args:
+        db (Session): Database session to interact with the database.
+        machines (List[ArcadeMachineCreate]): Les bornes à insérer.
+
+    Returns:
+        int: Le nombre de bornes insérées.
+    """
+    if not machines:
+        return 0
+    rows = [m.model_dump(exclude={"nb_player_min", "nb_player_max"}) for m in machines]
+    db.execute(insert(ArcadeMachines), rows)
+    db.commit()
+    return len(rows)
+
+
+async def get_all_arcade_machines_service(db: AsyncSession, include_deleted: bool = False):
     """
     Retrieves all arcade machine records from the database.
 
     Args:
-        db (Session): Database session for querying arcade machine records.
+        db (AsyncSession): Async database session for querying arcade machine records.
         include_deleted (bool, optional): If True, include soft-deleted machines. Defaults to False.
 
     Returns:
-        List[ArcadeMachines]: A list of all arcade machine records in the database.
+        List[Row]: A list of column tuples covering ArcadeMachineResponse.
     """
-    query = db.query(ArcadeMachines)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = select(*_ARCADE_COLS)
+    stmt = filter_deleted_stmt(stmt, ArcadeMachines, include_deleted)
+    result = await db.execute(stmt)
+    return result.all()
 
 
-def get_arcade_machine_by_id_service(db: Session, machine_id: UUID, include_deleted: bool = False):
+async def stream_all_arcade_machines_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams arcade machine records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying arcade machine records.
+        include_deleted (bool, optional): If True, include soft-deleted machines. Defaults to False.
+
+    Returns:
+        AsyncResult: An async iterator over column tuples, fetched 500 rows at a time.
+    """
+    stmt = select(*_ARCADE_COLS).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, ArcadeMachines, include_deleted)
+    return await db.stream(stmt)
+
+
+async def get_arcade_machine_by_id_service(db: AsyncSession, machine_id: UUID, include_deleted: bool = False):
     """
     Retrieves a specific arcade machine by its unique ID.
 
     Args:
-        db (Session): Database session for querying arcade machine records.
+        db (AsyncSession): Async database session for querying arcade machine records.
         machine_id (UUID): The unique identifier of the arcade machine to retrieve.
         include_deleted (bool, optional): If True, include soft-deleted machines. Defaults to False.
 
@@ -55,9 +114,17 @@ def get_arcade_machine_by_id_service(db: Session, machine_id: UUID, include_dele
     Raises:
         HTTPException: If the arcade machine with the given ID is not found (404 status code).
     """
-    query = db.query(ArcadeMachines).filter(ArcadeMachines.id == machine_id)
-    query = filter_deleted(query, include_deleted)
-    machine = query.first()
+    # ArcadeMachineResponse ne sérialise que des colonnes scalaires :
+    # raiseload("*") fait échouer bruyamment tout lazy load accidentel de
+    # game1/game2 plutôt que d'émettre des requêtes cachées.
+    if include_deleted:
+        stmt = filter_deleted_stmt(
+            select(ArcadeMachines).options(raiseload("*")).where(ArcadeMachines.id == machine_id),
+            ArcadeMachines, include_deleted,
+        )
+        machine = (await db.execute(stmt)).scalar_one_or_none()
+    else:
+        machine = (await db.execute(_MACHINE_BY_ID_STMT, {"mid": machine_id})).scalar_one_or_none()
 
     if not machine:
         raise HTTPException(status_code=404, detail="Arcade machine not found")
@@ -79,19 +146,32 @@ def update_arcade_machine_service(db: Session, machine_id: UUID, machine_update:
     Raises:
         HTTPException: If the arcade machine with the given ID is not found (404 status code).
     """
-    query = db.query(ArcadeMachines).filter(ArcadeMachines.id == machine_id)
-    query = filter_deleted(query, False)
-    machine = query.first()
-
-    if not machine:
+    payload = machine_update.model_dump(exclude_unset=True)
+    if not payload:
+        # Rien à écrire : simple lecture pour le 404 et renvoi de l'existant.
+        machine = db.get(ArcadeMachines, machine_id)
+        if machine is None or machine.is_deleted:
+            raise HTTPException(status_code=404, detail="Arcade machine not found")
+        return machine
+
+    # Un seul UPDATE ... RETURNING : pas de SELECT préalable, pas de suivi
+    # attribut par attribut, pas de refresh après commit.
+    machine = db.execute(
+        update(ArcadeMachines)
+        .where(ArcadeMachines.id == machine_id,
+               or_(ArcadeMachines.is_deleted.is_(False), ArcadeMachines.is_deleted.is_(None)))
+        .values(**payload)
+        .returning(ArcadeMachines)
+    ).scalar_one_or_none()
+
+    if machine is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Arcade machine not found")
 
-    # Update the arcade machine fields with the new data
-    for key, value in machine_update.dict(exclude_unset=True).items():
-        setattr(machine, key, value)
-
     db.commit()
-    db.refresh(machine)
+
+    # L'UPDATE Core contourne le flush ORM : purge manuelle du cache.
+    cache.delete(cache.arcade_games_key(machine.id))
     return machine
 
 
@@ -110,11 +190,12 @@ def delete_arcade_machine_service(db: Session, machine_id: UUID, hard_delete: bo
     Raises:
         HTTPException: If the arcade machine with the given ID is not found (404 status code).
     """
-    query = db.query(ArcadeMachines).filter(ArcadeMachines.id == machine_id)
-    query = filter_deleted(query, False)
-    machine = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    machine = db.get(ArcadeMachines, machine_id)
 
-    if not machine:
+    if machine is None or machine.is_deleted:
         raise HTTPException(status_code=404, detail="Arcade machine not found")
 
     if hard_delete:
@@ -142,7 +223,7 @@ def restore_arcade_machine_service(db: Session, machine_id: UUID):
             - 404: If the arcade machine is not found.
             - 400: If the arcade machine is not deleted.
     """
-    machine = db.query(ArcadeMachines).filter(ArcadeMachines.id == machine_id).first()
+    machine = db.get(ArcadeMachines, machine_id, execution_options={"include_deleted": True})
 
     if not machine:
         raise HTTPException(status_code=404, detail="Arcade machine not found")
@@ -153,6 +234,5 @@ def restore_arcade_machine_service(db: Session, machine_id: UUID):
     machine.is_deleted = False
     machine.deleted_at = None
     db.commit()
-    db.refresh(machine)
 
     return machine
\ No newline at end of file
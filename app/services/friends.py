@@ -1,9 +1,70 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as _pg_insert
+from sqlalchemy.dialects.sqlite import insert as _sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, load_only, raiseload
 from fastapi import HTTPException
 from uuid import UUID
 from app.models import Friends
 from app.schemas import FriendsCreate, FriendsUpdate
-from app.utils.db_utils import filter_deleted, soft_delete
+from app.utils.db_utils import filter_deleted_stmt, soft_delete
+from app import cache
+
+
+def _with_user_loads(stmt):
+    """Charge friend_from/friend_to en jointure : une requête au lieu de 2N+1
+    si la sérialisation touche les utilisateurs liés. raiseload("*") fait
+    échouer bruyamment tout lazy load accidentel plutôt que de réintroduire
+    un N+1 silencieux en production. load_only limite la projection aux
+    colonnes que FriendsResponse sérialise réellement."""
+    return stmt.options(
+        load_only(Friends.friend_from_id, Friends.friend_to_id,
+                  Friends.accept, Friends.decline, Friends.delete),
+        joinedload(Friends.friend_from), joinedload(Friends.friend_to), raiseload("*")
+    )
+
+
+# Instructions les plus chaudes construites une fois à l'import : la
+# construction select()/where() Python sort du chemin critique de chaque
+# requête, et le cache de compilation de l'engine (query_cache_size) réutilise
+# le SQL généré. Seul le chemin courant include_deleted=False est précompilé ;
+# le chemin rare reste construit dynamiquement dans les services.
+_OVERVIEW_STMT = filter_deleted_stmt(
+    _with_user_loads(select(Friends)).where(
+        (Friends.friend_from_id == bindparam("uid"))
+        | (Friends.friend_to_id == bindparam("uid"))
+    ),
+    Friends,
+)
+
+# Projection des listes : FriendsResponse ne sérialise que ces colonnes
+# scalaires, hydrater des entités ORM complètes ne sert à rien. Les attributs
+# ORM (et non __table__.c) gardent le filtre global de suppression logique.
+_FRIEND_COLS = (Friends.id, Friends.friend_from_id, Friends.friend_to_id,
+                Friends.accept, Friends.decline, Friends.delete)
+
+_PENDING_STMT = (
+    filter_deleted_stmt(
+        _with_user_loads(select(Friends)).where(
+            (Friends.friend_to_id == bindparam("uid"))
+            & (Friends.accept == False)
+            & (Friends.decline == False)
+        ),
+        Friends,
+    )
+    .order_by(Friends.id)
+    .limit(bindparam("limit"))
+    .offset(bindparam("offset"))
+)
+
+_FRIEND_BY_ID_STMT = _with_user_loads(select(Friends)).where(Friends.id == bindparam("fid"))
+
+
+def _insert_for(db: Session):
+    """Construct INSERT du dialecte courant : ON CONFLICT n'existe pas dans le
+    Core générique, mais Postgres (prod) et SQLite (tests) partagent la même
+    API on_conflict_do_update."""
+    return _pg_insert if db.get_bind().dialect.name == "postgresql" else _sqlite_insert
 
 
 def create_friend_service(db: Session, friend_data: FriendsCreate):
@@ -20,32 +81,15 @@ def create_friend_service(db: Session, friend_data: FriendsCreate):
     Raises:
         HTTPException: If the friendship already exists (400 status code).
     """
-    # Check if the friendship already exists (same direction)
-    query = db.query(Friends).filter(
-        Friends.friend_from_id == friend_data.friend_from_id,
-        Friends.friend_to_id == friend_data.friend_to_id
-    )
-    query = filter_deleted(query, True)  # Inclure même les amitiés supprimées pour détecter les doublons
-    existing_friend = query.first()
-
-    if existing_friend:
-        if existing_friend.is_deleted:
-            # Si l'amitié existe mais est supprimée, on la restaure
-            existing_friend.is_deleted = False
-            existing_friend.deleted_at = None
-            db.commit()
-            db.refresh(existing_friend)
-            return existing_friend
-        else:
-            raise HTTPException(status_code=400, detail="Friendship already exists")
-
-    # Check if a reverse friendship already exists (opposite direction)
-    reverse_query = db.query(Friends).filter(
-        Friends.friend_from_id == friend_data.friend_to_id,
-        Friends.friend_to_id == friend_data.friend_from_id
-    )
-    reverse_query = filter_deleted(reverse_query, True)  # Inclure même les amitiés supprimées
-    reverse_friendship = reverse_query.first()
+    # Check if a reverse friendship already exists (opposite direction).
+    # Seul is_deleted pilote le branchement : projeter deux colonnes évite
+    # d'hydrater une entité ORM complète pour un simple test d'existence.
+    reverse_friendship = db.execute(
+        select(Friends.id, Friends.is_deleted).where(
+            Friends.friend_from_id == friend_data.friend_to_id,
+            Friends.friend_to_id == friend_data.friend_from_id,
+        ).execution_options(include_deleted=True)  # Inclure même les amitiés supprimées
+    ).first()
 
     if reverse_friendship:
         # Une amitié dans le sens inverse existe déjà
@@ -63,20 +107,41 @@ def create_friend_service(db: Session, friend_data: FriendsCreate):
                 detail="A friendship request already exists from the other user"
             )
 
-    # Create the new friendship relationship
-    new_friend = Friends(**friend_data.model_dump())
-    db.add(new_friend)
+    # Détection du doublon aller + insertion + restauration en un seul
+    # INSERT ... ON CONFLICT : la contrainte unique_friendship arbitre le
+    # conflit, le DO UPDATE ne restaure que les lignes supprimées (clause
+    # WHERE), et le RETURNING rend la ligne sans db.refresh(). Un conflit sur
+    # une amitié vivante ne retourne aucune ligne : c'est le cas "doublon".
+    insert = _insert_for(db)
+    stmt = (insert(Friends)
+            .values(**friend_data.model_dump())
+            .on_conflict_do_update(
+                index_elements=["friend_from_id", "friend_to_id"],
+                set_={"is_deleted": False, "deleted_at": None},
+                where=Friends.is_deleted.is_(True),
+            )
+            .returning(Friends))
+    new_friend = db.execute(stmt).scalar_one_or_none()
+
+    if new_friend is None:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Friendship already exists")
+
     db.commit()
-    db.refresh(new_friend)
+
+    # L'INSERT Core contourne le flush ORM : les listeners d'invalidation de
+    # app/cache.py ne se déclenchent pas, purge manuelle des deux extrémités.
+    cache.delete(cache.friends_overview_key(new_friend.friend_from_id))
+    cache.delete(cache.friends_overview_key(new_friend.friend_to_id))
     return new_friend
 
 
-def get_friend_by_id_service(db: Session, friend_id: UUID, include_deleted: bool = False):
+async def get_friend_by_id_service(db: AsyncSession, friend_id: UUID, include_deleted: bool = False):
     """
     Retrieves a specific friendship by its unique ID.
 
     Args:
-        db (Session): Database session for querying friendship records.
+        db (AsyncSession): Async database session for querying friendship records.
         friend_id (UUID): The unique identifier of the friendship to retrieve.
         include_deleted (bool, optional): If True, include soft-deleted friendships. Defaults to False.
 
@@ -86,29 +151,55 @@ def get_friend_by_id_service(db: Session, friend_id: UUID, include_deleted: bool
     Raises:
         HTTPException: If the friendship with the given ID is not found (404 status code).
     """
-    query = db.query(Friends).filter(Friends.id == friend_id)
-    query = filter_deleted(query, include_deleted)
-    friend = query.first()
+    if include_deleted:
+        stmt = filter_deleted_stmt(
+            _with_user_loads(select(Friends)).where(Friends.id == friend_id),
+            Friends, include_deleted,
+        )
+        friend = (await db.execute(stmt)).scalar_one_or_none()
+    else:
+        # Chemin chaud : instruction précompilée à l'import, clé de cache O(1).
+        friend = (await db.execute(_FRIEND_BY_ID_STMT, {"fid": friend_id})).scalar_one_or_none()
 
     if not friend:
         raise HTTPException(status_code=404, detail="Friend not found")
     return friend
 
 
-def get_all_friends_service(db: Session, include_deleted: bool = False):
+async def get_all_friends_service(db: AsyncSession, include_deleted: bool = False,
+                                  limit: int = 50, offset: int = 0):
     """
-    Retrieves all friendship records from the database.
+    Retrieves friendship records from the database, one page at a time.
 
     Args:
-        db (Session): Database session for querying friendship records.
+        db (AsyncSession): Async database session for querying friendship records.
         include_deleted (bool, optional): If True, include soft-deleted friendships. Defaults to False.
+        limit (int, optional): Maximum number of records per page. Defaults to 50.
+        offset (int, optional): Number of records to skip. Defaults to 0.
 
     Returns:
-        List[Friends]: A list of all friendship records in the database.
+        List[Row]: A page of friendship column tuples.
     """
-    query = db.query(Friends)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = select(*_FRIEND_COLS)
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
+    stmt = stmt.order_by(Friends.id).limit(limit).offset(offset)
+    return (await db.execute(stmt)).all()
+
+
+async def stream_all_friends_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams friendship records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying friendship records.
+        include_deleted (bool, optional): If True, include soft-deleted friendships. Defaults to False.
+
+    Returns:
+        AsyncResult: An async iterator over friendship column tuples, fetched 500 rows at a time.
+    """
+    stmt = select(*_FRIEND_COLS).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
+    return await db.stream(stmt)
 
 
 def update_friend_service(db: Session, friend_id: UUID, update_data: FriendsUpdate):
@@ -126,19 +217,33 @@ def update_friend_service(db: Session, friend_id: UUID, update_data: FriendsUpda
     Raises:
         HTTPException: If the friendship with the given ID is not found (404 status code).
     """
-    query = db.query(Friends).filter(Friends.id == friend_id)
-    query = filter_deleted(query, False)
-    friend = query.first()
-
-    if not friend:
+    payload = update_data.model_dump(exclude_unset=True)
+    if not payload:
+        # Rien à écrire : simple lecture pour le 404 et renvoi de l'existant.
+        friend = db.get(Friends, friend_id)
+        if friend is None or friend.is_deleted:
+            raise HTTPException(status_code=404, detail="Friend not found")
+        return friend
+
+    # Un seul UPDATE ... RETURNING : pas de SELECT préalable, pas de suivi
+    # attribut par attribut, pas de refresh après commit.
+    friend = db.execute(
+        update(Friends)
+        .where(Friends.id == friend_id,
+               or_(Friends.is_deleted.is_(False), Friends.is_deleted.is_(None)))
+        .values(**payload)
+        .returning(Friends)
+    ).scalar_one_or_none()
+
+    if friend is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Friend not found")
 
-    # Update the friendship fields with the new data
-    for key, value in update_data.dict(exclude_unset=True).items():
-        setattr(friend, key, value)
-
     db.commit()
-    db.refresh(friend)
+
+    # L'UPDATE Core contourne le flush ORM : purge manuelle de l'overview.
+    cache.delete(cache.friends_overview_key(friend.friend_from_id))
+    cache.delete(cache.friends_overview_key(friend.friend_to_id))
     return friend
 
 
@@ -157,11 +262,12 @@ def delete_friend_service(db: Session, friend_id: UUID, hard_delete: bool = Fals
     Raises:
         HTTPException: If the friendship with the given ID is not found (404 status code).
     """
-    query = db.query(Friends).filter(Friends.id == friend_id)
-    query = filter_deleted(query, False)
-    friend = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    friend = db.get(Friends, friend_id)
 
-    if not friend:
+    if friend is None or friend.is_deleted:
         raise HTTPException(status_code=404, detail="Friend not found")
 
     if hard_delete:
@@ -189,7 +295,7 @@ def restore_friend_service(db: Session, friend_id: UUID):
             - 404: If the friendship is not found.
             - 400: If the friendship is not deleted.
     """
-    friend = db.query(Friends).filter(Friends.id == friend_id).first()
+    friend = db.get(Friends, friend_id, execution_options={"include_deleted": True})
 
     if not friend:
         raise HTTPException(status_code=404, detail="Friend not found")
@@ -200,11 +306,10 @@ def restore_friend_service(db: Session, friend_id: UUID):
     friend.is_deleted = False
     friend.deleted_at = None
     db.commit()
-    db.refresh(friend)
 
     return friend
 
-def get_friends_from_service(db: Session, user_id: UUID, include_deleted: bool = False):
+async def get_friends_from_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False):
     """
     Récupère toutes les amitiés initiées par un utilisateur spécifique.
 
@@ -217,12 +322,12 @@ def get_friends_from_service(db: Session, user_id: UUID, include_deleted: bool =
     Returns:
         List[Friends]: Une liste de toutes les amitiés initiées par l'utilisateur.
     """
-    query = db.query(Friends).filter(Friends.friend_from_id == user_id)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = _with_user_loads(select(Friends)).where(Friends.friend_from_id == user_id)
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_friends_to_service(db: Session, user_id: UUID, include_deleted: bool = False):
+async def get_friends_to_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False):
     """
     Récupère toutes les amitiés reçues par un utilisateur spécifique.
 
@@ -235,12 +340,12 @@ def get_friends_to_service(db: Session, user_id: UUID, include_deleted: bool = F
     Returns:
         List[Friends]: Une liste de toutes les amitiés reçues par l'utilisateur.
     """
-    query = db.query(Friends).filter(Friends.friend_to_id == user_id)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = _with_user_loads(select(Friends)).where(Friends.friend_to_id == user_id)
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_all_user_friends_service(db: Session, user_id: UUID, include_deleted: bool = False):
+async def get_all_user_friends_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False):
     """
     Récupère toutes les amitiés d'un utilisateur (initiées ET reçues).
 
@@ -253,19 +358,57 @@ def get_all_user_friends_service(db: Session, user_id: UUID, include_deleted: bo
     Returns:
         List[Friends]: Une liste de toutes les amitiés de l'utilisateur.
     """
-    query = db.query(Friends).filter(
+    stmt = _with_user_loads(select(Friends)).where(
         (Friends.friend_from_id == user_id) | (Friends.friend_to_id == user_id)
     )
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_friends_by_status_service(
-        db: Session,
+async def get_friends_overview_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False):
+    """
+    Récupère en une seule requête les trois volets de l'écran "amis" :
+    amitiés acceptées, demandes reçues en attente et demandes envoyées en
+    attente. Le partitionnement se fait en Python pour éviter trois
+    allers-retours SQL (et trois vérifications d'auth côté client).
+
+    Args:
+        db (Session): Session de base de données pour les requêtes.
+        user_id (UUID): L'identifiant unique de l'utilisateur.
+        include_deleted (bool, optional): Si True, inclut les amitiés supprimées logiquement.
+                                          Defaults to False.
+
+    Returns:
+        dict: {"accepted": [...], "received": [...], "sent": [...]}.
+    """
+    if include_deleted:
+        stmt = _with_user_loads(select(Friends)).where(
+            (Friends.friend_from_id == user_id) | (Friends.friend_to_id == user_id)
+        )
+        friendships = (await db.execute(stmt)).scalars().all()
+    else:
+        friendships = (await db.execute(_OVERVIEW_STMT, {"uid": user_id})).scalars().all()
+
+    accepted, received, sent = [], [], []
+    for friend in friendships:
+        if friend.accept:
+            accepted.append(friend)
+        elif not friend.decline:
+            if friend.friend_to_id == user_id:
+                received.append(friend)
+            else:
+                sent.append(friend)
+    return {"accepted": accepted, "received": received, "sent": sent}
+
+
+async def get_friends_by_status_service(
+        db: AsyncSession,
         user_id: UUID,
         accepted: bool = None,
         declined: bool = None,
-        include_deleted: bool = False
+        include_deleted: bool = False,
+        limit: int = 50,
+        offset: int = 0
 ):
     """
     Récupère les amitiés d'un utilisateur filtrées par statut.
@@ -284,25 +427,27 @@ def get_friends_by_status_service(
         List[Friends]: Une liste des amitiés filtrées.
     """
     # Requête de base pour toutes les amitiés impliquant cet utilisateur
-    query = db.query(Friends).filter(
+    stmt = _with_user_loads(select(Friends)).where(
         (Friends.friend_from_id == user_id) | (Friends.friend_to_id == user_id)
     )
 
     # Filtrer par statut accepté
     if accepted is not None:
-        query = query.filter(Friends.accept == accepted)
+        stmt = stmt.where(Friends.accept == accepted)
 
     # Filtrer par statut refusé
     if declined is not None:
-        query = query.filter(Friends.decline == declined)
+        stmt = stmt.where(Friends.decline == declined)
 
     # Filtre de suppression logique
-    query = filter_deleted(query, include_deleted)
+    stmt = filter_deleted_stmt(stmt, Friends, include_deleted)
 
-    return query.all()
+    stmt = stmt.order_by(Friends.id).limit(limit).offset(offset)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_pending_friends_service(db: Session, user_id: UUID, include_deleted: bool = False):
+async def get_pending_friends_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False,
+                                      limit: int = 50, offset: int = 0):
     """
     Récupère les demandes d'amitié en attente pour un utilisateur.
 
@@ -315,11 +460,14 @@ def get_pending_friends_service(db: Session, user_id: UUID, include_deleted: boo
     Returns:
         List[Friends]: Une liste des demandes d'amitié en attente.
     """
-    query = db.query(Friends).filter(
-        (Friends.friend_to_id == user_id) &  # Demandes reçues
-        (Friends.accept == False) &  # Non acceptées
-        (Friends.decline == False)  # Non refusées
-    )
-
-    query = filter_deleted(query, include_deleted)
-    return query.all()
\ No newline at end of file
+    if include_deleted:
+        stmt = _with_user_loads(select(Friends)).where(
+            (Friends.friend_to_id == user_id) &  # Demandes reçues
+            (Friends.accept == False) &  # Non acceptées
+            (Friends.decline == False)  # Non refusées
+        )
+        stmt = stmt.order_by(Friends.id).limit(limit).offset(offset)
+        return (await db.execute(stmt)).scalars().all()
+
+    params = {"uid": user_id, "limit": limit, "offset": offset}
+    return (await db.execute(_PENDING_STMT, params)).scalars().all()
\ No newline at end of file
@@ -1,9 +1,13 @@
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from app.data_base import SessionLocal
 from app.models import Games
 from app.schemas import GameCreate, GameUpdate
 from uuid import UUID
-from fastapi import HTTPException
-from app.utils.db_utils import filter_deleted, soft_delete
+from fastapi import BackgroundTasks, HTTPException
+from app.utils.db_utils import filter_deleted_stmt, soft_delete
+from app import cache
 
 
 def create_game_service(db: Session, game: GameCreate):
@@ -23,32 +27,50 @@ def create_game_service(db: Session, game: GameCreate):
     new_game = Games(**game.model_dump())
     db.add(new_game)
     db.commit()
-    db.refresh(new_game)
+    # Pas de refresh : le flush ramène les défauts serveur via RETURNING
+    # et la session n'expire plus les objets au commit.
     return new_game
 
 
-def get_all_games_service(db: Session, include_deleted: bool = False):
+async def get_all_games_service(db: AsyncSession, include_deleted: bool = False):
     """
     Retrieves all game records from the database.
 
     Args:
-        db (Session): Database session for querying game records.
+        db (AsyncSession): Async database session for querying game records.
         include_deleted (bool, optional): If True, include soft-deleted games. Defaults to False.
 
     Returns:
         List[Games]: A list of all game records in the database.
     """
-    query = db.query(Games)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = select(Games)
+    stmt = filter_deleted_stmt(stmt, Games, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_game_by_id_service(db: Session, game_id: UUID, include_deleted: bool = False):
+async def stream_all_games_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams game records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying game records.
+        include_deleted (bool, optional): If True, include soft-deleted games. Defaults to False.
+
+    Returns:
+        AsyncScalarResult: An async iterator over games, fetched 500 rows at a time.
+    """
+    stmt = select(Games).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, Games, include_deleted)
+    result = await db.stream(stmt)
+    return result.scalars()
+
+
+async def get_game_by_id_service(db: AsyncSession, game_id: UUID, include_deleted: bool = False):
     """
     Retrieves a specific game by its unique ID.
 
     Args:
-        db (Session): Database session for querying game records.
+        db (AsyncSession): Async database session for querying game records.
         game_id (UUID): The unique identifier of the game to retrieve.
         include_deleted (bool, optional): If True, include soft-deleted games. Defaults to False.
 
@@ -58,9 +80,9 @@ def get_game_by_id_service(db: Session, game_id: UUID, include_deleted: bool = F
     Raises:
         HTTPException: If the game with the given ID is not found (404 status code).
     """
-    query = db.query(Games).filter(Games.id == game_id)
-    query = filter_deleted(query, include_deleted)
-    game = query.first()
+    stmt = select(Games).where(Games.id == game_id)
+    stmt = filter_deleted_stmt(stmt, Games, include_deleted)
+    game = (await db.execute(stmt)).scalar_one_or_none()
 
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
@@ -82,23 +104,37 @@ def update_game_service(db: Session, game_id: UUID, game_update: GameUpdate):
     Raises:
         HTTPException: If the game with the given ID is not found (404 status code).
     """
-    query = db.query(Games).filter(Games.id == game_id)
-    query = filter_deleted(query, False)  # Ne pas inclure les jeux supprimés
-    game = query.first()
-
-    if not game:
+    payload = game_update.model_dump(exclude_unset=True)
+    if not payload:
+        # Rien à écrire : simple lecture pour le 404 et renvoi de l'existant.
+        game = db.get(Games, game_id)
+        if game is None or game.is_deleted:
+            raise HTTPException(status_code=404, detail="Game not found")
+        return game
+
+    # Un seul UPDATE ... RETURNING : pas de SELECT préalable, pas de suivi
+    # attribut par attribut, pas de refresh après commit.
+    game = db.execute(
+        update(Games)
+        .where(Games.id == game_id,
+               or_(Games.is_deleted.is_(False), Games.is_deleted.is_(None)))
+        .values(**payload)
+        .returning(Games)
+    ).scalar_one_or_none()
+
+    if game is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Game not found")
 
-    # Update the game fields with the new data
-    for key, value in game_update.dict(exclude_unset=True).items():
-        setattr(game, key, value)
-
     db.commit()
-    db.refresh(game)
+
+    # L'UPDATE Core contourne le flush ORM : purge manuelle du cache.
+    cache.delete(cache.games_list_key())
     return game
 
 
-def delete_game_service(db: Session, game_id: UUID, hard_delete: bool = False):
+def delete_game_service(db: Session, game_id: UUID, hard_delete: bool = False,
+                        background_tasks: BackgroundTasks = None):
     """
     Deletes a game record from the database.
 
@@ -106,6 +142,8 @@ def delete_game_service(db: Session, game_id: UUID, hard_delete: bool = False):
         db (Session): Database session for interacting with the database.
         game_id (UUID): The unique identifier of the game to delete.
         hard_delete (bool, optional): If True, physically delete the record. Defaults to False.
+        background_tasks (BackgroundTasks, optional): When provided, the physical
+            purge is deferred until after the response is sent.
 
     Returns:
         dict: A success message upon successful deletion.
@@ -113,22 +151,51 @@ def delete_game_service(db: Session, game_id: UUID, hard_delete: bool = False):
     Raises:
         HTTPException: If the game with the given ID is not found (404 status code).
     """
-    query = db.query(Games).filter(Games.id == game_id)
-    query = filter_deleted(query, False)
-    game = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    game = db.get(Games, game_id)
 
-    if not game:
+    if game is None or game.is_deleted:
         raise HTTPException(status_code=404, detail="Game not found")
 
     if hard_delete:
-        db.delete(game)
-        db.commit()
+        if background_tasks is not None:
+            # Le client n'attend pas la cascade : soft delete synchrone (la
+            # ligne disparaît tout de suite des lectures par défaut), purge
+            # physique planifiée après l'envoi de la réponse.
+            soft_delete(game, db)
+            background_tasks.add_task(purge_game_service, game_id)
+        else:
+            db.delete(game)
+            db.commit()
     else:
         soft_delete(game, db)
 
     return {"message": "Game deleted successfully"}
 
 
+def purge_game_service(game_id: UUID):
+    """
+    Physically removes a soft-deleted game (deferred hard delete).
+
+    Args:
+        game_id (UUID): The unique identifier of the game to purge.
+
+    Notes:
+        Runs after the response is sent, so it opens its own session rather
+        than reusing the request-scoped one.
+    """
+    db = SessionLocal()
+    try:
+        game = db.get(Games, game_id, execution_options={"include_deleted": True})
+        if game is not None:
+            db.delete(game)
+            db.commit()
+    finally:
+        db.close()
+
+
 def restore_game_service(db: Session, game_id: UUID):
     """
     Restores a soft-deleted game.
@@ -145,7 +212,7 @@ def restore_game_service(db: Session, game_id: UUID):
             - 404: If the game is not found.
             - 400: If the game is not deleted.
     """
-    game = db.query(Games).filter(Games.id == game_id).first()
+    game = db.get(Games, game_id, execution_options={"include_deleted": True})
 
     if not game:
         raise HTTPException(status_code=404, detail="Game not found")
@@ -156,6 +223,5 @@ def restore_game_service(db: Session, game_id: UUID):
     game.is_deleted = False
     game.deleted_at = None
     db.commit()
-    db.refresh(game)
 
     return game
\ No newline at end of file
@@ -1,9 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload
+from app.data_base import SessionLocal
 from app.models import Parties
 from app.schemas import PartyCreate, PartyUpdate
 from uuid import UUID
-from fastapi import HTTPException
-from app.utils.db_utils import filter_deleted, soft_delete
+from fastapi import BackgroundTasks, HTTPException
+from app.utils.db_utils import filter_deleted_stmt, soft_delete
 
 
 def create_party_service(db: Session, party: PartyCreate):
@@ -23,32 +26,54 @@ def create_party_service(db: Session, party: PartyCreate):
     new_party = Parties(**party.model_dump())
     db.add(new_party)
     db.commit()
-    db.refresh(new_party)
+    # Pas de refresh : le flush ramène les défauts serveur via RETURNING
+    # et la session n'expire plus les objets au commit.
     return new_party
 
 
-def get_all_parties_service(db: Session, include_deleted: bool = False):
+async def get_all_parties_service(db: AsyncSession, include_deleted: bool = False):
     """
     Retrieves all party records from the database.
 
     Args:
-        db (Session): Database session for querying party records.
+        db (AsyncSession): Async database session for querying party records.
         include_deleted (bool, optional): If True, include soft-deleted parties. Defaults to False.
 
     Returns:
         List[Parties]: A list of all party records in the database.
     """
-    query = db.query(Parties)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    # La réponse ne sérialise que des colonnes scalaires : inutile de
+    # charger les relations, mais raiseload("*") transforme tout lazy load
+    # accidentel (et son N+1) en erreur bruyante plutôt qu'en requêtes
+    # silencieuses par ligne.
+    stmt = select(Parties).options(raiseload("*"))
+    stmt = filter_deleted_stmt(stmt, Parties, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_party_by_id_service(db: Session, party_id: UUID, include_deleted: bool = False):
+async def stream_all_parties_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams party records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying party records.
+        include_deleted (bool, optional): If True, include soft-deleted parties. Defaults to False.
+
+    Returns:
+        AsyncScalarResult: An async iterator over parties, fetched 500 rows at a time.
+    """
+    stmt = select(Parties).options(raiseload("*")).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, Parties, include_deleted)
+    result = await db.stream(stmt)
+    return result.scalars()
+
+
+async def get_party_by_id_service(db: AsyncSession, party_id: UUID, include_deleted: bool = False):
     """
     Retrieves a specific party by its unique ID.
 
     Args:
-        db (Session): Database session for querying party records.
+        db (AsyncSession): Async database session for querying party records.
         party_id (UUID): The unique identifier of the party to retrieve.
         include_deleted (bool, optional): If True, include soft-deleted parties. Defaults to False.
 
@@ -58,9 +83,9 @@ def get_party_by_id_service(db: Session, party_id: UUID, include_deleted: bool =
     Raises:
         HTTPException: If the party with the given ID is not found (404 status code).
     """
-    query = db.query(Parties).filter(Parties.id == party_id)
-    query = filter_deleted(query, include_deleted)
-    party = query.first()
+    stmt = select(Parties).options(raiseload("*")).where(Parties.id == party_id)
+    stmt = filter_deleted_stmt(stmt, Parties, include_deleted)
+    party = (await db.execute(stmt)).scalar_one_or_none()
 
     if not party:
         raise HTTPException(status_code=404, detail="Party not found")
@@ -82,23 +107,34 @@ def update_party_service(db: Session, party_id: UUID, party_update: PartyUpdate)
     Raises:
         HTTPException: If the party with the given ID is not found (404 status code).
     """
-    query = db.query(Parties).filter(Parties.id == party_id)
-    query = filter_deleted(query, False)
-    party = query.first()
-
-    if not party:
+    payload = party_update.model_dump(exclude_unset=True)
+    if not payload:
+        # Rien à écrire : simple lecture pour le 404 et renvoi de l'existant.
+        party = db.get(Parties, party_id)
+        if party is None or party.is_deleted:
+            raise HTTPException(status_code=404, detail="Party not found")
+        return party
+
+    # Un seul UPDATE ... RETURNING : pas de SELECT préalable, pas de suivi
+    # attribut par attribut, pas de refresh après commit.
+    party = db.execute(
+        update(Parties)
+        .where(Parties.id == party_id,
+               or_(Parties.is_deleted.is_(False), Parties.is_deleted.is_(None)))
+        .values(**payload)
+        .returning(Parties)
+    ).scalar_one_or_none()
+
+    if party is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Party not found")
 
-    # Update the party fields with the new data
-    for key, value in party_update.dict(exclude_unset=True).items():
-        setattr(party, key, value)
-
     db.commit()
-    db.refresh(party)
     return party
 
 
-def delete_party_service(db: Session, party_id: UUID, hard_delete: bool = False):
+def delete_party_service(db: Session, party_id: UUID, hard_delete: bool = False,
+                        background_tasks: BackgroundTasks = None):
     """
     Deletes a party record from the database.
 
@@ -106,6 +142,8 @@ def delete_party_service(db: Session, party_id: UUID, hard_delete: bool = False)
         db (Session): Database session for interacting with the database.
         party_id (UUID): The unique identifier of the party to delete.
         hard_delete (bool, optional): If True, physically delete the record. Defaults to False.
+        background_tasks (BackgroundTasks, optional): When provided, the physical
+            purge is deferred until after the response is sent.
 
     Returns:
         dict: A success message upon successful deletion.
@@ -113,22 +151,51 @@ def delete_party_service(db: Session, party_id: UUID, hard_delete: bool = False)
     Raises:
         HTTPException: If the party with the given ID is not found (404 status code).
     """
-    query = db.query(Parties).filter(Parties.id == party_id)
-    query = filter_deleted(query, False)
-    party = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    party = db.get(Parties, party_id)
 
-    if not party:
+    if party is None or party.is_deleted:
         raise HTTPException(status_code=404, detail="Party not found")
 
     if hard_delete:
-        db.delete(party)
-        db.commit()
+        if background_tasks is not None:
+            # Le client n'attend pas la cascade : soft delete synchrone (la
+            # ligne disparaît tout de suite des lectures par défaut), purge
+            # physique planifiée après l'envoi de la réponse.
+            soft_delete(party, db)
+            background_tasks.add_task(purge_party_service, party_id)
+        else:
+            db.delete(party)
+            db.commit()
     else:
         soft_delete(party, db)
 
     return {"message": "Party deleted successfully"}
 
 
+def purge_party_service(party_id: UUID):
+    """
+    Physically removes a soft-deleted party (deferred hard delete).
+
+    Args:
+        party_id (UUID): The unique identifier of the party to purge.
+
+    Notes:
+        Runs after the response is sent, so it opens its own session rather
+        than reusing the request-scoped one.
+    """
+    db = SessionLocal()
+    try:
+        party = db.get(Parties, party_id, execution_options={"include_deleted": True})
+        if party is not None:
+            db.delete(party)
+            db.commit()
+    finally:
+        db.close()
+
+
 def restore_party_service(db: Session, party_id: UUID):
     """
     Restores a soft-deleted party.
@@ -145,7 +212,7 @@ def restore_party_service(db: Session, party_id: UUID):
             - 404: If the party is not found.
             - 400: If the party is not deleted.
     """
-    party = db.query(Parties).filter(Parties.id == party_id).first()
+    party = db.get(Parties, party_id, execution_options={"include_deleted": True})
 
     if not party:
         raise HTTPException(status_code=404, detail="Party not found")
@@ -156,6 +223,5 @@ def restore_party_service(db: Session, party_id: UUID):
     party.is_deleted = False
     party.deleted_at = None
     db.commit()
-    db.refresh(party)
 
     return party
\ No newline at end of file
@@ -1,9 +1,12 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload
+from app.data_base import SessionLocal
 from app.models import Payments
 from app.schemas import PaymentCreate, PaymentUpdate
 from uuid import UUID
-from fastapi import HTTPException
-from app.utils.db_utils import filter_deleted, soft_delete
+from fastapi import BackgroundTasks, HTTPException
+from app.utils.db_utils import filter_deleted_stmt, soft_delete
 
 
 def create_payment_service(db: Session, payment: PaymentCreate):
@@ -23,32 +26,54 @@ def create_payment_service(db: Session, payment: PaymentCreate):
     new_payment = Payments(**payment.model_dump())
     db.add(new_payment)
     db.commit()
-    db.refresh(new_payment)
+    # Pas de refresh : le flush ramène les défauts serveur via RETURNING
+    # et la session n'expire plus les objets au commit.
     return new_payment
 
 
-def get_all_payments_service(db: Session, include_deleted: bool = False):
+async def get_all_payments_service(db: AsyncSession, include_deleted: bool = False):
     """
     Retrieves all payment records from the database.
 
     Args:
-        db (Session): Database session for querying payment records.
+        db (AsyncSession): Async database session for querying payment records.
         include_deleted (bool, optional): If True, include soft-deleted payments. Defaults to False.
 
     Returns:
         List[Payments]: A list of all payment records in the database.
     """
-    query = db.query(Payments)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    # La réponse ne sérialise que des colonnes scalaires : inutile de
+    # charger les relations, mais raiseload("*") transforme tout lazy load
+    # accidentel (et son N+1) en erreur bruyante plutôt qu'en requêtes
+    # silencieuses par ligne.
+    stmt = select(Payments).options(raiseload("*"))
+    stmt = filter_deleted_stmt(stmt, Payments, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_payment_by_id_service(db: Session, payment_id: UUID, include_deleted: bool = False):
+async def stream_all_payments_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams payment records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying payment records.
+        include_deleted (bool, optional): If True, include soft-deleted payments. Defaults to False.
+
+    Returns:
+        AsyncScalarResult: An async iterator over payments, fetched 500 rows at a time.
+    """
+    stmt = select(Payments).options(raiseload("*")).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, Payments, include_deleted)
+    result = await db.stream(stmt)
+    return result.scalars()
+
+
+async def get_payment_by_id_service(db: AsyncSession, payment_id: UUID, include_deleted: bool = False):
     """
     Retrieves a specific payment by its unique ID.
 
     Args:
-        db (Session): Database session for querying payment records.
+        db (AsyncSession): Async database session for querying payment records.
         payment_id (UUID): The unique identifier of the payment to retrieve.
         include_deleted (bool, optional): If True, include soft-deleted payments. Defaults to False.
 
@@ -58,9 +83,9 @@ def get_payment_by_id_service(db: Session, payment_id: UUID, include_deleted: bo
     Raises:
         HTTPException: If the payment with the given ID is not found (404 status code).
     """
-    query = db.query(Payments).filter(Payments.id == payment_id)
-    query = filter_deleted(query, include_deleted)
-    payment = query.first()
+    stmt = select(Payments).options(raiseload("*")).where(Payments.id == payment_id)
+    stmt = filter_deleted_stmt(stmt, Payments, include_deleted)
+    payment = (await db.execute(stmt)).scalar_one_or_none()
 
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
@@ -82,23 +107,34 @@ def update_payment_service(db: Session, payment_id: UUID, payment_update: Paymen
     Raises:
         HTTPException: If the payment with the given ID is not found (404 status code).
     """
-    query = db.query(Payments).filter(Payments.id == payment_id)
-    query = filter_deleted(query, False)
-    payment = query.first()
-
-    if not payment:
+    payload = payment_update.model_dump(exclude_unset=True)
+    if not payload:
+        # Rien à écrire : simple lecture pour le 404 et renvoi de l'existant.
+        payment = db.get(Payments, payment_id)
+        if payment is None or payment.is_deleted:
+            raise HTTPException(status_code=404, detail="Payment not found")
+        return payment
+
+    # Un seul UPDATE ... RETURNING : pas de SELECT préalable, pas de suivi
+    # attribut par attribut, pas de refresh après commit.
+    payment = db.execute(
+        update(Payments)
+        .where(Payments.id == payment_id,
+               or_(Payments.is_deleted.is_(False), Payments.is_deleted.is_(None)))
+        .values(**payload)
+        .returning(Payments)
+    ).scalar_one_or_none()
+
+    if payment is None:
+        db.rollback()
         raise HTTPException(status_code=404, detail="Payment not found")
 
-    # Update the payment fields with the new data
-    for key, value in payment_update.dict(exclude_unset=True).items():
-        setattr(payment, key, value)
-
     db.commit()
-    db.refresh(payment)
     return payment
 
 
-def delete_payment_service(db: Session, payment_id: UUID, hard_delete: bool = False):
+def delete_payment_service(db: Session, payment_id: UUID, hard_delete: bool = False,
+                        background_tasks: BackgroundTasks = None):
     """
     Deletes a payment record from the database.
 
@@ -106,6 +142,8 @@ def delete_payment_service(db: Session, payment_id: UUID, hard_delete: bool = Fa
         db (Session): Database session for interacting with the database.
         payment_id (UUID): The unique identifier of the payment to delete.
         hard_delete (bool, optional): If True, physically delete the record. Defaults to False.
+        background_tasks (BackgroundTasks, optional): When provided, the physical
+            purge is deferred until after the response is sent.
 
     Returns:
         dict: A success message upon successful deletion.
@@ -113,22 +151,51 @@ def delete_payment_service(db: Session, payment_id: UUID, hard_delete: bool = Fa
     Raises:
         HTTPException: If the payment with the given ID is not found (404 status code).
     """
-    query = db.query(Payments).filter(Payments.id == payment_id)
-    query = filter_deleted(query, False)
-    payment = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    payment = db.get(Payments, payment_id)
 
-    if not payment:
+    if payment is None or payment.is_deleted:
         raise HTTPException(status_code=404, detail="Payment not found")
 
     if hard_delete:
-        db.delete(payment)
-        db.commit()
+        if background_tasks is not None:
+            # Le client n'attend pas la cascade : soft delete synchrone (la
+            # ligne disparaît tout de suite des lectures par défaut), purge
+            # physique planifiée après l'envoi de la réponse.
+            soft_delete(payment, db)
+            background_tasks.add_task(purge_payment_service, payment_id)
+        else:
+            db.delete(payment)
+            db.commit()
     else:
         soft_delete(payment, db)
 
     return {"message": "Payment deleted successfully"}
 
 
+def purge_payment_service(payment_id: UUID):
+    """
+    Physically removes a soft-deleted payment (deferred hard delete).
+
+    Args:
+        payment_id (UUID): The unique identifier of the payment to purge.
+
+    Notes:
+        Runs after the response is sent, so it opens its own session rather
+        than reusing the request-scoped one.
+    """
+    db = SessionLocal()
+    try:
+        payment = db.get(Payments, payment_id, execution_options={"include_deleted": True})
+        if payment is not None:
+            db.delete(payment)
+            db.commit()
+    finally:
+        db.close()
+
+
 def restore_payment_service(db: Session, payment_id: UUID):
     """
     Restores a soft-deleted payment.
@@ -145,7 +212,7 @@ def restore_payment_service(db: Session, payment_id: UUID):
             - 404: If the payment is not found.
             - 400: If the payment is not deleted.
     """
-    payment = db.query(Payments).filter(Payments.id == payment_id).first()
+    payment = db.get(Payments, payment_id, execution_options={"include_deleted": True})
 
     if not payment:
         raise HTTPException(status_code=404, detail="Payment not found")
@@ -156,6 +223,5 @@ def restore_payment_service(db: Session, payment_id: UUID):
     payment.is_deleted = False
     payment.deleted_at = None
     db.commit()
-    db.refresh(payment)
 
     return payment
\ No newline at end of file
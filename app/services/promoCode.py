@@ -1,18 +1,54 @@
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import HTTPException
 from app.models import PromoCodes, Users
 from app.schemas import PromoCodeCreate, PromoCodeUpdate
 from datetime import datetime
 from uuid import UUID
+import secrets
 import string
-import random
-from app.utils.db_utils import filter_deleted, soft_delete
+from app.utils.db_utils import filter_deleted_stmt
+from app import cache
 
 
+# Alphabet construit une fois à l'import ; secrets fournit un tirage CSPRNG
+# sans coût supplémentaire notable sur 8 caractères.
+_PROMO_ALPHABET = string.ascii_uppercase + string.digits
+
 def generate_promo_code(length=8):
     """Génère un code promo aléatoire alphanumérique."""
-    characters = string.ascii_uppercase + string.digits
-    return ''.join(random.choice(characters) for _ in range(length))
+    return ''.join(secrets.choice(_PROMO_ALPHABET) for _ in range(length))
+
+
+def generate_unique_promo_code(db: Session, length: int = 8, candidates: int = 8):
+    """
+    Génère un code promo garanti libre en un seul aller-retour SQL.
+
+    Plutôt que de tirer un code puis de vérifier la collision requête par
+    requête, on tire plusieurs candidats d'un coup et on élimine les
+    collisions avec un unique SELECT ... IN (...). Avec 36^8 combinaisons,
+    le premier lot suffit en pratique ; la boucle ne sert que de filet.
+
+    Args:
+        db (Session): Session de base de données pour la vérification d'unicité.
+        length (int): Longueur des codes générés.
+        candidates (int): Nombre de candidats tirés par lot.
+
+    Returns:
+        str: Un code promo inutilisé (y compris parmi les codes supprimés).
+    """
+    while True:
+        batch = {generate_promo_code(length) for _ in range(candidates)}
+        taken = {
+            row[0]
+            for row in db.query(PromoCodes.code)
+            .execution_options(include_deleted=True)
+            .filter(PromoCodes.code.in_(batch))
+        }
+        for code in batch:
+            if code not in taken:
+                return code
 
 
 def create_promo_code_service(db: Session, promo_code: PromoCodeCreate):
@@ -30,7 +66,10 @@ def create_promo_code_service(db: Session, promo_code: PromoCodeCreate):
         HTTPException: Si un code promo avec le même code existe déjà.
     """
     # Vérifier si le code existe déjà (même supprimé logiquement)
-    existing_code = db.query(PromoCodes).filter(PromoCodes.code == promo_code.code).first()
+    existing_code = db.execute(
+        select(PromoCodes).where(PromoCodes.code == promo_code.code)
+        .execution_options(include_deleted=True)
+    ).scalar_one_or_none()
 
     if existing_code:
         if existing_code.is_deleted:
@@ -41,7 +80,6 @@ def create_promo_code_service(db: Session, promo_code: PromoCodeCreate):
             existing_code.is_deleted = False
             existing_code.deleted_at = None
             db.commit()
-            db.refresh(existing_code)
             return existing_code
         else:
             raise HTTPException(status_code=400, detail="Un code promo avec ce code existe déjà")
@@ -49,37 +87,36 @@ def create_promo_code_service(db: Session, promo_code: PromoCodeCreate):
     new_promo_code = PromoCodes(**promo_code.model_dump())
     db.add(new_promo_code)
     db.commit()
-    db.refresh(new_promo_code)
     return new_promo_code
 
 
-def get_all_promo_codes_service(db: Session, include_inactive: bool = False, include_deleted: bool = False):
+async def get_all_promo_codes_service(db: AsyncSession, include_inactive: bool = False, include_deleted: bool = False):
     """
     Récupère tous les codes promo de la base de données.
 
     Args:
-        db (Session): Session de base de données pour les requêtes.
+        db (AsyncSession): Session de base de données asynchrone pour les requêtes.
         include_inactive (bool): Si True, inclut également les codes inactifs.
         include_deleted (bool): Si True, inclut également les codes supprimés logiquement.
 
     Returns:
         List[PromoCodes]: Une liste de tous les codes promo.
     """
-    query = db.query(PromoCodes)
+    stmt = select(PromoCodes)
 
     if not include_inactive:
-        query = query.filter(PromoCodes.is_active == True)
+        stmt = stmt.where(PromoCodes.is_active == True)
 
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    stmt = filter_deleted_stmt(stmt, PromoCodes, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
 
 
-def get_promo_code_by_id_service(db: Session, promo_code_id: UUID, include_deleted: bool = False):
+async def get_promo_code_by_id_service(db: AsyncSession, promo_code_id: UUID, include_deleted: bool = False):
     """
     Récupère un code promo spécifique par son ID.
 
     Args:
-        db (Session): Session de base de données pour les requêtes.
+        db (AsyncSession): Session de base de données asynchrone pour les requêtes.
         promo_code_id (UUID): L'identifiant unique du code promo à récupérer.
         include_deleted (bool): Si True, inclut également les codes supprimés logiquement.
 
@@ -89,21 +126,21 @@ def get_promo_code_by_id_service(db: Session, promo_code_id: UUID, include_delet
     Raises:
         HTTPException: Si le code promo avec l'ID donné n'est pas trouvé.
     """
-    query = db.query(PromoCodes).filter(PromoCodes.id == promo_code_id)
-    query = filter_deleted(query, include_deleted)
-    promo_code = query.first()
+    stmt = select(PromoCodes).where(PromoCodes.id == promo_code_id)
+    stmt = filter_deleted_stmt(stmt, PromoCodes, include_deleted)
+    promo_code = (await db.execute(stmt)).scalar_one_or_none()
 
     if not promo_code:
         raise HTTPException(status_code=404, detail="Code promo non trouvé")
     return promo_code
 
 
-def get_promo_code_by_code_service(db: Session, code: str, include_deleted: bool = False):
+async def get_promo_code_by_code_service(db: AsyncSession, code: str, include_deleted: bool = False):
     """
     Récupère un code promo spécifique par son code.
 
     Args:
-        db (Session): Session de base de données pour les requêtes.
+        db (AsyncSession): Session de base de données asynchrone pour les requêtes.
         code (str): Le code à rechercher.
         include_deleted (bool): Si True, inclut également les codes supprimés logiquement.
 
@@ -113,9 +150,9 @@ def get_promo_code_by_code_service(db: Session, code: str, include_deleted: bool
     Raises:
         HTTPException: Si le code promo n'est pas trouvé.
     """
-    query = db.query(PromoCodes).filter(PromoCodes.code == code.upper())
-    query = filter_deleted(query, include_deleted)
-    promo_code = query.first()
+    stmt = select(PromoCodes).where(PromoCodes.code == code.upper())
+    stmt = filter_deleted_stmt(stmt, PromoCodes, include_deleted)
+    promo_code = (await db.execute(stmt)).scalar_one_or_none()
 
     if not promo_code:
         raise HTTPException(status_code=404, detail="Code promo non trouvé")
@@ -137,16 +174,20 @@ def update_promo_code_service(db: Session, promo_code_id: UUID, promo_code_updat
     Raises:
         HTTPException: Si le code promo avec l'ID donné n'est pas trouvé ou si la mise à jour échoue.
     """
-    query = db.query(PromoCodes).filter(PromoCodes.id == promo_code_id)
-    query = filter_deleted(query, False)
-    promo_code = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    promo_code = db.get(PromoCodes, promo_code_id)
 
-    if not promo_code:
+    if promo_code is None or promo_code.is_deleted:
         raise HTTPException(status_code=404, detail="Code promo non trouvé")
 
     # Vérifier si le nouveau code est déjà utilisé par un autre code promo
     if promo_code_update.code is not None and promo_code_update.code != promo_code.code:
-        existing_code = db.query(PromoCodes).filter(PromoCodes.code == promo_code_update.code).first()
+        existing_code = db.execute(
+            select(PromoCodes).where(PromoCodes.code == promo_code_update.code)
+            .execution_options(include_deleted=True)
+        ).scalar_one_or_none()
         if existing_code:
             raise HTTPException(status_code=400, detail="Un code promo avec ce code existe déjà")
 
@@ -156,7 +197,6 @@ def update_promo_code_service(db: Session, promo_code_id: UUID, promo_code_updat
         setattr(promo_code, key, value)
 
     db.commit()
-    db.refresh(promo_code)
     return promo_code
 
 
@@ -175,18 +215,27 @@ def delete_promo_code_service(db: Session, promo_code_id: UUID, hard_delete: boo
     Raises:
         HTTPException: Si le code promo avec l'ID donné n'est pas trouvé.
     """
-    query = db.query(PromoCodes).filter(PromoCodes.id == promo_code_id)
-    query = filter_deleted(query, False)
-    promo_code = query.first()
-
-    if not promo_code:
-        raise HTTPException(status_code=404, detail="Code promo non trouvé")
-
+    # Même schéma que delete_user_service : la garde "ligne vivante" est dans
+    # le WHERE, le RETURNING signale l'absence — un seul aller-retour.
+    live = or_(PromoCodes.is_deleted.is_(False), PromoCodes.is_deleted.is_(None))
     if hard_delete:
-        db.delete(promo_code)
-        db.commit()
+        stmt = delete(PromoCodes).where(PromoCodes.id == promo_code_id, live).returning(PromoCodes)
     else:
-        soft_delete(promo_code, db)
+        stmt = (update(PromoCodes)
+                .where(PromoCodes.id == promo_code_id, live)
+                .values(is_deleted=True, deleted_at=func.now())
+                .returning(PromoCodes))
+    promo_code = db.execute(stmt).scalar_one_or_none()
+
+    if promo_code is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Code promo non trouvé")
+
+    db.commit()
+
+    # Les UPDATE/DELETE en masse contournent le flush ORM : purge manuelle.
+    cache.delete(cache.promo_code_by_code_key(promo_code.code))
+    cache.delete(cache.promo_codes_list_key())
 
     return {"message": "Code promo supprimé avec succès"}
 
@@ -207,7 +256,7 @@ def restore_promo_code_service(db: Session, promo_code_id: UUID):
             - 404: Si le code promo n'est pas trouvé.
             - 400: Si le code promo n'est pas supprimé.
     """
-    promo_code = db.query(PromoCodes).filter(PromoCodes.id == promo_code_id).first()
+    promo_code = db.get(PromoCodes, promo_code_id, execution_options={"include_deleted": True})
 
     if not promo_code:
         raise HTTPException(status_code=404, detail="Code promo non trouvé")
@@ -218,15 +267,45 @@ def restore_promo_code_service(db: Session, promo_code_id: UUID):
     promo_code.is_deleted = False
     promo_code.deleted_at = None
     db.commit()
-    db.refresh(promo_code)
 
     return promo_code
 
 
+def _cached_promo_precheck(code_norm: str):
+    """
+    Rejet rapide d'un rachat depuis le cache applicatif, sans toucher la BDD.
+
+    Seules les raisons stables entre deux écritures sont tranchées ici (code
+    inactif, code expiré) : toute écriture sur promo_codes purge l'entrée,
+    donc une entrée présente reflète le dernier état commité. Le quota
+    (used_count) évolue à chaque rachat et reste arbitré par la garde SQL.
+
+    Args:
+        code_norm (str): Le code promo normalisé en majuscules.
+
+    Raises:
+        HTTPException: Si le cache démontre que le code est inactif ou expiré.
+    """
+    cached = cache.get(cache.promo_code_by_code_key(code_norm))
+    if not cached:
+        return
+    if not cached.get("is_active"):
+        raise HTTPException(status_code=400, detail="Ce code promo n'est plus actif")
+    expires_at = cached.get("expires_at")
+    if expires_at is not None and expires_at < datetime.utcnow():
+        raise HTTPException(status_code=400, detail="Ce code promo a expiré")
+
+
 def use_promo_code_service(db: Session, code: str, user_id: UUID):
     """
     Utilise un code promo pour un utilisateur spécifique.
 
+    L'utilisation se fait en un seul UPDATE conditionnel : les gardes
+    (code actif, non supprimé, non expiré, quota non atteint) font partie du
+    WHERE, donc deux utilisations concurrentes ne peuvent pas dépasser
+    max_uses — pas de read-modify-write à verrouiller, ni de SELECT préalable
+    sur le chemin nominal.
+
     Args:
         db (Session): Session de base de données pour interagir avec la BDD.
         code (str): Le code promo à utiliser.
@@ -238,45 +317,75 @@ def use_promo_code_service(db: Session, code: str, user_id: UUID):
     Raises:
         HTTPException: Si le code est invalide, expiré, ou déjà utilisé trop de fois.
     """
-    # Récupérer le code promo (non supprimé)
-    query = db.query(PromoCodes).filter(PromoCodes.code == code.upper())
-    query = filter_deleted(query, False)
-    promo_code = query.first()
+    code_norm = code.upper()
+    _cached_promo_precheck(code_norm)
+    now = datetime.utcnow()
+
+    redeemed = db.execute(
+        update(PromoCodes)
+        .where(
+            PromoCodes.code == code_norm,
+            PromoCodes.is_active == True,
+            or_(PromoCodes.is_deleted.is_(False), PromoCodes.is_deleted.is_(None)),
+            or_(PromoCodes.expires_at.is_(None), PromoCodes.expires_at >= now),
+            or_(PromoCodes.max_uses.is_(None), PromoCodes.used_count < PromoCodes.max_uses),
+        )
+        .values(used_count=PromoCodes.used_count + 1)
+        .returning(PromoCodes.nb_parties)
+    ).first()
+
+    if redeemed is None:
+        # Chemin d'erreur uniquement : on relit le code pour produire le
+        # message de refus précis attendu par les clients.
+        db.rollback()
+        _raise_promo_rejection(db, code_norm)
+
+    nb_parties = redeemed[0]
+
+    credited = db.execute(
+        update(Users)
+        .where(
+            Users.id == user_id,
+            or_(Users.is_deleted.is_(False), Users.is_deleted.is_(None)),
+        )
+        .values(nb_ticket=Users.nb_ticket + nb_parties)
+        .returning(Users.id, Users.firebase_id)
+    ).first()
+    if credited is None:
+        # Annule l'incrément du compteur : même transaction, pas encore commitée.
+        db.rollback()
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    db.commit()
+
+    # Les UPDATE en masse ne passent pas par le flush ORM : les listeners
+    # d'invalidation de app/cache.py ne se déclenchent pas, on purge à la main
+    # — côté promo comme côté utilisateur crédité (nb_ticket et ETag).
+    cache.delete(cache.promo_code_by_code_key(code_norm))
+    cache.delete(cache.promo_codes_list_key())
+    cache.delete(cache.user_by_id_key(credited.id))
+    cache.delete(cache.user_by_firebase_key(credited.firebase_id))
+
+    return {
+        "success": True,
+        "message": f"Code promo utilisé avec succès! {nb_parties} tickets ajoutés à votre compte.",
+        "nb_parties": nb_parties
+    }
+
+
+def _raise_promo_rejection(db: Session, code: str):
+    """Rejoue les contrôles en lecture pour lever le bon message de refus."""
+    promo_code = db.execute(
+        select(PromoCodes).where(PromoCodes.code == code)
+    ).scalar_one_or_none()
 
     if not promo_code:
         raise HTTPException(status_code=404, detail="Code promo invalide")
 
-    # Vérifier si le code est actif
     if not promo_code.is_active:
         raise HTTPException(status_code=400, detail="Ce code promo n'est plus actif")
 
-    # Vérifier si le code a expiré
     if promo_code.expires_at and promo_code.expires_at < datetime.utcnow():
         raise HTTPException(status_code=400, detail="Ce code promo a expiré")
 
-    # Vérifier le nombre d'utilisations maximal
-    if promo_code.max_uses and promo_code.used_count >= promo_code.max_uses:
-        raise HTTPException(status_code=400, detail="Ce code promo a atteint son nombre maximal d'utilisations")
-
-    # Récupérer l'utilisateur (non supprimé)
-    query = db.query(Users).filter(Users.id == user_id)
-    query = filter_deleted(query, False)
-    user = query.first()
-
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-
-    # Ajouter les tickets à l'utilisateur
-    user.nb_ticket += promo_code.nb_parties
-
-    # Incrémenter le compteur d'utilisation du code
-    promo_code.used_count += 1
-
-    # Mettre à jour la base de données
-    db.commit()
-
-    return {
-        "success": True,
-        "message": f"Code promo utilisé avec succès! {promo_code.nb_parties} tickets ajoutés à votre compte.",
-        "nb_parties": promo_code.nb_parties
-    }
\ No newline at end of file
+    raise HTTPException(status_code=400, detail="Ce code promo a atteint son nombre maximal d'utilisations")
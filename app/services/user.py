@@ -1,11 +1,15 @@
 from uuid import UUID
 import uuid
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, raiseload
 from typing import List
 from app.models import Users
 from app.schemas import UserCreate
 from fastapi import HTTPException
-from app.utils.db_utils import filter_deleted, soft_delete
+from app.utils.db_utils import filter_deleted_stmt
+from app import cache
 
 
 def generate_unique_id(db: Session):
@@ -25,7 +29,10 @@ def generate_unique_id(db: Session):
     while True:
         new_id = str(uuid.uuid4().int)[:12]
 
-        existing_user = db.query(Users).filter_by(publique_id=new_id).first()
+        existing_user = db.execute(
+            select(Users).where(Users.publique_id == new_id)
+            .execution_options(include_deleted=True)
+        ).scalar_one_or_none()
         if not existing_user:
             return new_id
 
@@ -41,49 +48,104 @@ def create_user_service(db: Session, user: UserCreate):
     Returns:
         Users: The newly created user's information.
 
+    Raises:
+        HTTPException:
+            - 400 status code if a user with the given Firebase ID already exists.
+
     Notes:
         This function generates a unique public ID and then inserts the new user into the database.
+        Le doublon de firebase_id n'est pas pré-vérifié par un SELECT : l'index
+        unique tranche au moment de l'INSERT (une seule garde, un seul
+        aller-retour sur le chemin nominal, pas de fenêtre de course).
     """
     unique_pub_id = generate_unique_id(db)
     db_user = Users(**user.model_dump(), publique_id=unique_pub_id)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="User with this Firebase ID already exists")
     return db_user
 
 
-def get_users_service(db: Session, include_deleted: bool = False) -> List[Users]:
+async def get_users_service(db: AsyncSession, include_deleted: bool = False) -> List[Users]:
     """
     Returns a list of all users in the database.
 
     Args:
-        db (Session): Database session for querying users.
+        db (AsyncSession): Async database session for querying users.
         include_deleted (bool, optional): Si True, inclut les utilisateurs supprimés. Par défaut à False.
 
     Returns:
         List[Users]: A list of all user records from the database.
     """
-    query = db.query(Users)
-    query = filter_deleted(query, include_deleted)
-    return query.all()
+    # UserResponse ne lit que des colonnes scalaires : raiseload("*")
+    # transforme tout lazy load accidentel (Users.payments, etc.) en erreur
+    # bruyante plutôt qu'en N+1 silencieux pendant la sérialisation.
+    stmt = select(Users).options(raiseload("*"))
+    stmt = filter_deleted_stmt(stmt, Users, include_deleted)
+    return (await db.execute(stmt)).scalars().all()
+
+
+async def stream_all_users_service(db: AsyncSession, include_deleted: bool = False):
+    """
+    Streams user records in batches instead of materializing them all.
+
+    Args:
+        db (AsyncSession): Async database session for querying users.
+        include_deleted (bool, optional): Si True, inclut les utilisateurs supprimés. Par défaut à False.
+
+    Returns:
+        AsyncScalarResult: An async iterator over users, fetched 500 rows at a time.
+    """
+    stmt = select(Users).options(raiseload("*")).execution_options(yield_per=500)
+    stmt = filter_deleted_stmt(stmt, Users, include_deleted)
+    result = await db.stream(stmt)
+    return result.scalars()
+
+
+async def get_users_batch_service(db: AsyncSession, ids, firebase_ids) -> List[Users]:
+    """
+    Résout plusieurs utilisateurs en un seul SELECT (par id et/ou firebase_id).
 
+    Args:
+        db (AsyncSession): Async database session for querying users.
+        ids (list[UUID]): Les identifiants à résoudre.
+        firebase_ids (list[str]): Les identifiants Firebase à résoudre.
 
-def get_user_by_id_service(db: Session, user_id: UUID, include_deleted: bool = False) -> Users:
+    Returns:
+        List[Users]: Les utilisateurs vivants correspondant à au moins une clé —
+        un aller-retour quel que soit le nombre de clés demandées.
+    """
+    conditions = []
+    if ids:
+        conditions.append(Users.id.in_(ids))
+    if firebase_ids:
+        conditions.append(Users.firebase_id.in_(firebase_ids))
+    if not conditions:
+        return []
+
+    stmt = select(Users).options(raiseload("*")).where(or_(*conditions))
+    stmt = filter_deleted_stmt(stmt, Users, False)
+    return (await db.execute(stmt)).scalars().all()
+
+
+async def get_user_by_id_service(db: AsyncSession, user_id: UUID, include_deleted: bool = False) -> Users:
     """
     Returns a specific user by their unique ID.
 
     Args:
-        db (Session): Database session for querying users.
+        db (AsyncSession): Async database session for querying users.
         user_id (UUID): The unique identifier of the user to retrieve.
         include_deleted (bool, optional): Si True, inclut les utilisateurs supprimés. Par défaut à False.
 
     Returns:
         Users: The user corresponding to the provided ID, or None if not found.
     """
-    query = db.query(Users).filter(Users.id == user_id)
-    query = filter_deleted(query, include_deleted)
-    db_user = query.first()
-    return db_user
+    stmt = select(Users).options(raiseload("*")).where(Users.id == user_id)
+    stmt = filter_deleted_stmt(stmt, Users, include_deleted)
+    return (await db.execute(stmt)).scalar_one_or_none()
 
 
 def update_user_service(user_id: UUID, user_data: UserCreate, db: Session):
@@ -103,11 +165,12 @@ def update_user_service(user_id: UUID, user_data: UserCreate, db: Session):
         HTTPException:
             - 404 status code if the user is not found in the database.
     """
-    query = db.query(Users).filter(Users.id == user_id)
-    query = filter_deleted(query, False)  # Ne pas inclure les utilisateurs supprimés
-    db_user = query.first()
+    # Session.get : identity map d'abord, puis SELECT par clé primaire sans
+    # compilation de requête ; le filtre global de suppression logique
+    # s'applique au chargement, la garde Python couvre l'identity map.
+    db_user = db.get(Users, user_id)
 
-    if not db_user:
+    if db_user is None or db_user.is_deleted:
         raise HTTPException(status_code=404, detail="User not found")
 
     # Mettre à jour uniquement les champs first_name et last_name
@@ -116,7 +179,6 @@ def update_user_service(user_id: UUID, user_data: UserCreate, db: Session):
     # Ne pas mettre à jour nb_ticket, bar, firebase_id
 
     db.commit()
-    db.refresh(db_user)
     return db_user
 
 
@@ -136,19 +198,28 @@ def delete_user_service(user_id: UUID, db: Session, hard_delete: bool = False):
         HTTPException:
             - 404 status code if the user is not found in the database.
     """
-    query = db.query(Users).filter(Users.id == user_id)
-    query = filter_deleted(query, False)  # Ne pas inclure les utilisateurs déjà supprimés
-    db_user = query.first()
-
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
-
+    # Une seule requête : la garde "ligne vivante" fait partie du WHERE et le
+    # RETURNING dit si une ligne a été touchée — pas de SELECT préalable.
+    live = or_(Users.is_deleted.is_(False), Users.is_deleted.is_(None))
     if hard_delete:
         # Suppression définitive
-        db.delete(db_user)
-        db.commit()
+        stmt = delete(Users).where(Users.id == user_id, live).returning(Users)
     else:
         # Suppression logique
-        soft_delete(db_user, db)
+        stmt = (update(Users)
+                .where(Users.id == user_id, live)
+                .values(is_deleted=True, deleted_at=func.now())
+                .returning(Users))
+    db_user = db.execute(stmt).scalar_one_or_none()
+
+    if db_user is None:
+        db.rollback()
+        raise HTTPException(status_code=404, detail="User not found")
+
+    db.commit()
 
+    # Les UPDATE/DELETE en masse ne passent pas par le flush ORM : les
+    # listeners d'invalidation de app/cache.py ne se déclenchent pas.
+    cache.delete(cache.user_by_id_key(db_user.id))
+    cache.delete(cache.user_by_firebase_key(db_user.firebase_id))
     return db_user
\ No newline at end of file
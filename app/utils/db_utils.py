@@ -1,5 +1,4 @@
 from datetime import datetime
-from sqlalchemy import or_, and_
 from sqlalchemy.orm import Query
 
 
@@ -7,6 +6,10 @@ def filter_deleted(query: Query, include_deleted: bool = False) -> Query:
     """
     Filtre les éléments supprimés logiquement d'une requête SQLAlchemy.
 
+    Le critère is_deleted lui-même est appliqué globalement par l'événement
+    do_orm_execute (voir app/models.py) : ce helper ne sert plus qu'à poser
+    l'option d'exécution include_deleted qui le débraye.
+
     Args:
         query (Query): La requête SQLAlchemy à filtrer.
         include_deleted (bool, optional): Si True, inclut également les éléments supprimés logiquement.
@@ -15,12 +18,29 @@ def filter_deleted(query: Query, include_deleted: bool = False) -> Query:
     Returns:
         Query: La requête filtrée.
     """
-    if not include_deleted:
-        return query.filter(or_(query.column_descriptions[0]['type'].is_deleted.is_(False),
-                                query.column_descriptions[0]['type'].is_deleted.is_(None)))
+    if include_deleted:
+        return query.execution_options(include_deleted=True)
     return query
 
 
+def filter_deleted_stmt(stmt, model, include_deleted: bool = False):
+    """
+    Équivalent de filter_deleted pour les select() du style 2.0 (sessions async).
+
+    Args:
+        stmt: Le select() SQLAlchemy à filtrer.
+        model: La classe mappée portant la colonne is_deleted.
+        include_deleted (bool, optional): Si True, inclut également les éléments
+            supprimés logiquement. Par défaut à False.
+
+    Returns:
+        Le select() filtré.
+    """
+    if include_deleted:
+        return stmt.execution_options(include_deleted=True)
+    return stmt
+
+
 def soft_delete(db_obj, db):
     """
     Marque un objet comme supprimé logiquement.
@@ -0,0 +1,25 @@
+import orjson
+
+
+def ndjson_stream(rows, adapter):
+    """
+    Générateur asynchrone émettant une ligne JSON par enregistrement (NDJSON).
+
+    Args:
+        rows: Un itérateur asynchrone d'objets ORM (typiquement db.stream()).
+        adapter (TypeAdapter): L'adaptateur Pydantic du modèle de réponse.
+
+    Returns:
+        Un générateur d'octets à passer à StreamingResponse : la mémoire reste
+        en O(lot) et le premier octet part dès le premier lot chargé.
+    """
+    async def generate():
+        async for row in rows:
+            yield orjson.dumps(
+                adapter.dump_python(
+                    adapter.validate_python(row, from_attributes=True),
+                    mode="json",
+                )
+            ) + b"\n"
+
+    return generate()
@@ -1,9 +1,21 @@
-import uvicorn
+import multiprocessing
+import os
 
-from app.main import app
+import uvicorn
 
 
 def launch():
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # Un worker par cœur, event loop uvloop et parser HTTP httptools (tous
+    # deux en C) : la config par défaut (1 process, asyncio, h11) plafonne
+    # vite sur les petits endpoints JSON.
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count()))),
+        loop="uvloop",
+        http="httptools",
+        access_log=False,
+    )
 if __name__ == "__main__":
-    launch()
\ No newline at end of file
+    launch()
@@ -1,3 +1,8 @@
+import os
+
+# Les tests s'appuient sur la création automatique du schéma à l'import.
+os.environ.setdefault("AUTO_CREATE_TABLES", "1")
+
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from fastapi import HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
@@ -6,14 +8,15 @@ from app.depends.firebase_auth import verify_firebase_token
 
 
 # ✅ Test : Token Firebase valide
+@patch("app.depends.firebase_auth._get_app")
 @patch("firebase_admin.auth.verify_id_token")
-def test_verify_firebase_token_valid(mock_verify):
+def test_verify_firebase_token_valid(mock_verify, mock_get_app):
     """ Vérifie qu'un token valide est bien authentifié """
     mock_verify.return_value = {"uid": "12345"}  # Simule une réponse Firebase
 
     fake_credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="valid_token")
 
-    result = verify_firebase_token(fake_credentials)
+    result = asyncio.run(verify_firebase_token(fake_credentials))
 
     assert result == {"uid": "12345"}  # Vérifie que l'UID est retourné
 
@@ -25,7 +28,7 @@ def test_verify_firebase_token_invalid(mock_verify):
     fake_credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials="invalid_token")
 
     with pytest.raises(HTTPException) as exc_info:
-        verify_firebase_token(fake_credentials)
+        asyncio.run(verify_firebase_token(fake_credentials))
 
     assert exc_info.value.status_code == 401
     assert exc_info.value.detail == "Invalid or expired token"
@@ -111,3 +111,26 @@ def test_delete_nonexistent_arcade_machine(client, test_db):
     response = client.delete(f"/arcade_machines/{fake_machine_id}")
     assert response.status_code == 404
     assert response.json()["detail"] == "Arcade machine not found"
+
+
+def test_bulk_create_arcade_machines(client, test_db):
+    """Test d'insertion en lot de machines d'arcade"""
+    machines = [
+        {
+            "name": f"Machine {i}",
+            "nb_player_min": 1,
+            "nb_player_max": 2,
+            "localisation": "Lille",
+            "game1_id": str(uuid4())
+        }
+        for i in range(3)
+    ]
+
+    response = client.post("/arcade_machines/bulk", json=machines)
+    assert response.status_code == 200
+    assert response.json() == {"created": 3}
+
+    listing = client.get("/arcade_machines/")
+    assert listing.status_code == 200
+    names = {m["name"] for m in listing.json()}
+    assert {"Machine 0", "Machine 1", "Machine 2"} <= names
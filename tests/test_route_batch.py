@@ -0,0 +1,50 @@
+from uuid import uuid4
+
+from app.models import Friends
+
+
+def test_execute_batch(client, test_db):
+    """Test de l'exécution de plusieurs sous-requêtes en un seul appel."""
+    friend = Friends(friend_from_id=uuid4(), friend_to_id=uuid4())
+    test_db.add(friend)
+    test_db.commit()
+    test_db.refresh(friend)
+
+    payload = {
+        "requests": [
+            {"id": "friends", "method": "GET", "url": "/friends/"},
+            {"id": "one", "method": "GET", "url": f"/friends/{friend.id}"},
+            {"id": "missing", "method": "GET", "url": f"/friends/{uuid4()}"},
+        ]
+    }
+    response = client.post("/batch/", json=payload)
+    assert response.status_code == 200
+    responses = {r["id"]: r for r in response.json()["responses"]}
+    assert responses["friends"]["status"] == 200
+    assert responses["one"]["status"] == 200
+    assert responses["one"]["body"]["id"] == str(friend.id)
+    assert responses["missing"]["status"] == 404
+
+
+def test_execute_batch_rejects_absolute_url(client, test_db):
+    """Test du rejet des sous-requêtes vers des URLs absolues."""
+    payload = {
+        "requests": [
+            {"id": "bad", "method": "GET", "url": "http://example.com/"},
+        ]
+    }
+    response = client.post("/batch/", json=payload)
+    assert response.status_code == 422
+
+
+def test_execute_batch_rejects_nested_batch(client, test_db):
+    """Test du rejet des batchs imbriqués."""
+    payload = {
+        "requests": [
+            {"id": "nested", "method": "POST", "url": "/batch/",
+             "body": {"requests": [{"id": "inner", "method": "GET", "url": "/friends/"}]}},
+        ]
+    }
+    response = client.post("/batch/", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Batch requests cannot be nested"
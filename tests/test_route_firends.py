@@ -93,3 +93,18 @@ def test_delete_friend_not_found(client, test_db):
     response = client.delete(f"/friends/{fake_id}")
     assert response.status_code == 404
     assert response.json()["detail"] == "Friend not found"
+
+def test_get_friends_overview(client, test_db):
+    """Test de récupération de l'overview amis (accepted / received / sent)."""
+    user_id = uuid4()
+    test_db.add(Friends(friend_from_id=uuid4(), friend_to_id=user_id, accept=True))
+    test_db.add(Friends(friend_from_id=uuid4(), friend_to_id=user_id))
+    test_db.add(Friends(friend_from_id=user_id, friend_to_id=uuid4()))
+    test_db.commit()
+
+    response = client.get(f"/friends/overview/{user_id}")
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["accepted"]) == 1
+    assert len(data["received"]) == 1
+    assert len(data["sent"]) == 1
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+
+def _create_user(client, firebase_id, nb_ticket=0):
+    """Crée un utilisateur de test et renvoie son JSON."""
+    response = client.post("/users/", json={
+        "first_name": "Promo",
+        "last_name": "Tester",
+        "nb_ticket": nb_ticket,
+        "bar": False,
+        "firebase_id": firebase_id
+    })
+    assert response.status_code == 200
+    return response.json()
+
+
+def _create_promo_code(client, code, **overrides):
+    """Crée un code promo de test et renvoie son JSON."""
+    payload = {"code": code, "nb_parties": 2, "is_active": True}
+    payload.update(overrides)
+    response = client.post("/promo_codes/", json=payload)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_use_promo_code_success(client, test_db):
+    """Test d'utilisation réussie : tickets crédités et visibles en GET"""
+    user = _create_user(client, "promo_firebase_1", nb_ticket=1)
+    _create_promo_code(client, "BIENVENUE1", nb_parties=3)
+
+    response = client.post("/promo_codes/use", json={
+        "code": "BIENVENUE1",
+        "user_id": user["id"]
+    })
+    assert response.status_code == 200
+    body = response.json()
+    assert body["success"] is True
+    assert body["nb_parties"] == 3
+
+    # La lecture qui suit immédiatement doit refléter le crédit (pas de
+    # nb_ticket périmé servi depuis le cache).
+    response = client.get(f"/users/{user['id']}")
+    assert response.status_code == 200
+    assert response.json()["nb_ticket"] == 4
+
+
+def test_use_promo_code_max_uses_exhausted(client, test_db):
+    """Test de quota : la deuxième utilisation d'un code max_uses=1 échoue"""
+    user = _create_user(client, "promo_firebase_2")
+    _create_promo_code(client, "UNIQUEFOIS", max_uses=1)
+
+    response = client.post("/promo_codes/use", json={
+        "code": "UNIQUEFOIS",
+        "user_id": user["id"]
+    })
+    assert response.status_code == 200
+
+    response = client.post("/promo_codes/use", json={
+        "code": "UNIQUEFOIS",
+        "user_id": user["id"]
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Ce code promo a atteint son nombre maximal d'utilisations"
+
+
+def test_use_expired_promo_code(client, test_db):
+    """Test d'utilisation d'un code promo expiré"""
+    user = _create_user(client, "promo_firebase_3")
+    expired_at = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    _create_promo_code(client, "TROPTARD99", expires_at=expired_at)
+
+    response = client.post("/promo_codes/use", json={
+        "code": "TROPTARD99",
+        "user_id": user["id"]
+    })
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Ce code promo a expiré"
+
+
+def test_use_nonexistent_promo_code(client, test_db):
+    """Test d'utilisation d'un code promo inexistant"""
+    user = _create_user(client, "promo_firebase_4")
+
+    response = client.post("/promo_codes/use", json={
+        "code": "INTROUVABLE",
+        "user_id": user["id"]
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Code promo invalide"
+
+
+def test_use_promo_code_nonexistent_user(client, test_db):
+    """Test d'utilisation par un utilisateur inexistant : used_count inchangé"""
+    promo = _create_promo_code(client, "SANSCLIENT")
+
+    response = client.post("/promo_codes/use", json={
+        "code": "SANSCLIENT",
+        "user_id": str(uuid4())
+    })
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Utilisateur non trouvé"
+
+    # L'échec côté utilisateur annule toute la transaction : le compteur
+    # d'utilisations ne doit pas avoir bougé.
+    response = client.get(f"/promo_codes/{promo['id']}")
+    assert response.status_code == 200
+    assert response.json()["used_count"] == 0
@@ -180,3 +180,27 @@ def test_update_non_existent_user(client):
 
     assert response.status_code == 404
     assert response.json()["detail"] == "User not found"
+
+
+def test_get_users_batch(client, test_db):
+    """Test de la résolution groupée d'utilisateurs par id et firebase_id."""
+    user1 = Users(firebase_id="batch_fb_1", publique_id="batch_pub_1", nb_ticket=0)
+    user2 = Users(firebase_id="batch_fb_2", publique_id="batch_pub_2", nb_ticket=0)
+    test_db.add_all([user1, user2])
+    test_db.commit()
+    test_db.refresh(user1)
+    test_db.refresh(user2)
+
+    unknown_id = str(uuid.uuid4())
+    payload = {
+        "ids": [str(user1.id), unknown_id],
+        "firebase_ids": ["batch_fb_2", "unknown_fb"],
+    }
+    response = client.post("/users/batch", json=payload)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert str(user1.id) in body["users"]
+    assert unknown_id not in body["users"]
+    assert body["firebase_users"]["batch_fb_2"]["id"] == str(user2.id)
+    assert "unknown_fb" not in body["firebase_users"]